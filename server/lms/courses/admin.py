@@ -8,14 +8,14 @@ class LessonInline(admin.TabularInline):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'published_course_count', 'created_at']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
     readonly_fields = ['created_at']
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'instructor', 'category', 'level', 'price', 'is_published', 'created_at']
+    list_display = ['title', 'instructor', 'category', 'level', 'price', 'is_published', 'lesson_count', 'enrollment_count', 'created_at']
     list_filter = ['is_published', 'category', 'instructor', 'level', 'created_at']
     prepopulated_fields = {'slug': ('title',)}
     search_fields = ['title', 'description']
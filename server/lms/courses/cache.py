@@ -0,0 +1,69 @@
+"""
+Response cache for the public (anonymous) catalog, plus per-lesson bodies.
+
+Every key embeds a global catalog version. Saving or deleting a course,
+lesson or category bumps the version, so stale entries are never read
+again and simply age out; nothing has to be purged.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from lms.cache_versions import bump_version, get_version, incr
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def get_catalog_version():
+    return get_version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(VERSION_KEY)
+
+
+def make_key(prefix, request, **kwargs):
+    params = sorted(request.query_params.lists())
+    lookup = sorted(kwargs.items())
+    digest = hashlib.md5(repr((params, lookup)).encode()).hexdigest()
+    return f'catalog:{get_catalog_version()}:{prefix}:{digest}'
+
+
+def get_cached(key):
+    entry = cache.get(key)
+    incr(MISSES_KEY if entry is None else HITS_KEY)
+    return entry
+
+
+def set_cached(key, data):
+    cache.set(key, data, timeout=getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def lesson_content_key(lesson_id, updated_at):
+    return f'lesson-content:{lesson_id}:{updated_at.timestamp()}'
+
+
+def get_lesson_content(lesson_id, updated_at):
+    return cache.get(lesson_content_key(lesson_id, updated_at))
+
+
+def set_lesson_content(lesson_id, updated_at, content):
+    cache.set(
+        lesson_content_key(lesson_id, updated_at), content,
+        timeout=getattr(settings, 'LESSON_CONTENT_CACHE_TIMEOUT', 3600),
+    )
@@ -0,0 +1,66 @@
+"""
+Denormalized counters on Course and Category.
+
+Receivers adjust them in place with F() expressions inside the transaction
+that changed the underlying rows; ``recount()`` rebuilds them from scratch.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Category, Course, Lesson
+
+
+def _shift(field, delta):
+    return Greatest(F(field) + delta, Value(0))
+
+
+def adjust_lesson_count(course_id, delta):
+    # Lesson changes also move the course's updated_at so detail validators
+    # (ETag / Last-Modified) notice additions and removals.
+    Course.objects.filter(pk=course_id).update(
+        lesson_count=_shift('lesson_count', delta), updated_at=timezone.now()
+    )
+
+
+def adjust_enrollment_count(course_id, delta):
+    Course.objects.filter(pk=course_id).update(enrollment_count=_shift('enrollment_count', delta))
+
+
+def adjust_published_course_count(category_id, delta):
+    Category.objects.filter(pk=category_id).update(
+        published_course_count=_shift('published_course_count', delta)
+    )
+
+
+def _count_subquery(queryset, group_field):
+    counts = queryset.filter(**{group_field: OuterRef('pk')}).order_by().values(group_field)
+    counts = counts.annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recount(course_ids=None):
+    """
+    Recompute every counter with set-based UPDATEs. Returns the number of
+    course and category rows written.
+    """
+    from enrollments.models import ArchivedEnrollment, Enrollment
+
+    courses = Course.objects.all()
+    categories = Category.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+        categories = categories.filter(courses__pk__in=course_ids).distinct()
+
+    updated_courses = courses.update(
+        lesson_count=_count_subquery(Lesson.objects.all(), 'course'),
+        # Archived enrollments keep counting towards their course.
+        enrollment_count=(
+            _count_subquery(Enrollment.objects.all(), 'course')
+            + _count_subquery(ArchivedEnrollment.objects.all(), 'course')
+        ),
+    )
+    updated_categories = Category.objects.filter(pk__in=categories.values('pk')).update(
+        published_course_count=_count_subquery(Course.objects.filter(is_published=True), 'category'),
+    )
+    return updated_courses, updated_categories
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from courses.models import Category, Course
+from lms.images import generate_variants
+
+IMAGE_FIELDS = [
+    (Course, 'thumbnail'),
+    (Category, 'icon'),
+    (get_user_model(), 'profile_picture'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP variants for existing thumbnails, category icons and profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants that already exist.')
+
+    def handle(self, *args, **options):
+        written = failed = 0
+        for model, field in IMAGE_FIELDS:
+            names = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True).iterator()
+            )
+            for name in names:
+                try:
+                    written += generate_variants(name, force=options['force'])
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__}.{field} {name}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} variants ({failed} originals failed).'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from courses import search
+from courses.models import Course, Lesson
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for courses and lessons.'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend is None:
+            raise CommandError('Full-text search is not supported on this database.')
+
+        with transaction.atomic():
+            backend.clear()
+            search.index_courses(Course.objects.iterator())
+            search.index_lessons(Lesson.objects.iterator())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Course.objects.count()} courses and {Lesson.objects.count()} lessons.'
+        ))
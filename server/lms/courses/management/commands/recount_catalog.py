@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored lesson, enrollment and published-course counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only recount this course id (repeatable).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            courses, categories = counters.recount(options['course_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {courses} courses and {categories} categories.'
+        ))
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from courses import search
+
+
+def create_search_index(apps, schema_editor):
+    backend = search.get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(backend.create_sql)
+
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    search.index_courses(Course.objects.iterator(), schema_editor.connection)
+    search.index_lessons(Lesson.objects.iterator(), schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    backend = search.get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(backend.drop_sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_indexes_for_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 17:06
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, group_field):
+    counts = queryset.filter(**{group_field: OuterRef('pk')}).order_by().values(group_field)
+    counts = counts.annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Category = apps.get_model('courses', 'Category')
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+
+    Course.objects.update(
+        lesson_count=count_of(Lesson.objects.all(), 'course'),
+        enrollment_count=count_of(Enrollment.objects.all(), 'course'),
+    )
+    Category.objects.update(
+        published_course_count=count_of(Course.objects.filter(is_published=True), 'category'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_search_index'),
+        ('enrollments', '0003_indexes_for_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_course_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+def assign_slots(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+
+    lessons, next_slots = [], {}
+    for lesson in Lesson.objects.order_by('course_id', 'order', 'id').only('id', 'course_id'):
+        lesson.slot = next_slots.get(lesson.course_id, 0)
+        next_slots[lesson.course_id] = lesson.slot + 1
+        lessons.append(lesson)
+    Lesson.objects.bulk_update(lessons, ['slot'], batch_size=1000)
+    for course_id, next_slot in next_slots.items():
+        Course.objects.filter(pk=course_id).update(next_lesson_slot=next_slot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='next_lesson_slot',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='slot',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_slots, migrations.RunPython.noop),
+    ]
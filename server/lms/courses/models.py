@@ -1,13 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.text import slugify
 
+from lms.mixins import TrackedModelMixin
 
-class Category(models.Model):
+
+class Category(TrackedModelMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
     icon = models.ImageField(upload_to='category_icons/', blank=True, null=True)
+    published_course_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
@@ -22,7 +25,21 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-class Course(models.Model):
+class CourseQuerySet(models.QuerySet):
+    def with_catalog_data(self):
+        """Load everything the catalog serializers read in a single query."""
+        return self.select_related('instructor', 'category')
+
+    def allocate_lesson_slots(self, course_id, count=1):
+        """
+        Reserve ``count`` consecutive lesson slots of a course and return the
+        first. Must run inside the transaction that saves the lessons.
+        """
+        self.filter(pk=course_id).update(next_lesson_slot=models.F('next_lesson_slot') + count)
+        return self.filter(pk=course_id).values_list('next_lesson_slot', flat=True).get() - count
+
+
+class Course(TrackedModelMixin, models.Model):
     LEVEL_CHOICES = [
         ('beginner', 'Beginner'),
         ('intermediate', 'Intermediate'),
@@ -52,17 +69,31 @@ class Course(models.Model):
     requirements = models.TextField(blank=True, null=True)
     what_will_you_learn = models.TextField(blank=True, null=True)
     is_published = models.BooleanField(default=False)
+    lesson_count = models.PositiveIntegerField(default=0, editable=False)
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
+    next_lesson_slot = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    @property
+    def counts_towards_category(self):
+        return self.is_published and self.category_id is not None
+
     class Meta:
         verbose_name_plural = "Courses"
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+        ]
 
-class Lesson(models.Model):
+class Lesson(TrackedModelMixin, models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True, null=True)
@@ -70,11 +101,26 @@ class Lesson(models.Model):
     duration = models.CharField(max_length=50, blank=True, null=True)
     order = models.PositiveIntegerField(default=0)
     is_preview = models.BooleanField(default=False)
+    # Stable position of the lesson within its course, never reused; bit
+    # index of the lesson in Enrollment.completed_bitmap.
+    slot = models.PositiveIntegerField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self._state.adding or self.loaded_value('course_id', self.course_id) != self.course_id:
+                self.slot = Course.objects.allocate_lesson_slots(self.course_id)
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'slot'}
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['course', 'order', 'id']),
+            models.Index(fields=['order', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
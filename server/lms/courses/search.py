@@ -0,0 +1,216 @@
+"""
+Full-text search over the course catalog.
+
+Courses and lessons are mirrored into a ``courses_search_index`` table that
+is created per database vendor by migration 0005: an FTS5 virtual table on
+SQLite, a ``tsvector`` column with a GIN index on PostgreSQL. Row ids encode
+what a row points at, so updates and deletes are primary-key lookups:
+course rows use ``-course.id`` and lesson rows use ``lesson.id``.
+
+Searches take a queryset of the courses (or lessons) the caller may see
+and restrict the match to it in the same statement, so hidden drafts never
+crowd out visible results; course hits are grouped to their best rank.
+"""
+import re
+
+from django.db import connection as default_connection
+
+SEARCH_TABLE = 'courses_search_index'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def course_entry_id(course_id):
+    return -course_id
+
+
+def lesson_entry_id(lesson_id):
+    return lesson_id
+
+
+def course_document(course):
+    body = ' '.join(filter(None, [course.description, course.what_will_you_learn]))
+    return course.title, body
+
+
+def lesson_document(lesson):
+    return lesson.title, lesson.content or ''
+
+
+class SQLiteSearchBackend:
+    create_sql = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "title, body, course_id UNINDEXED, lesson_id UNINDEXED, "
+        "tokenize='porter unicode61')"
+    )
+    drop_sql = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def upsert(self, rows):
+        """``rows`` is an iterable of (entry_id, course_id, lesson_id, title, body)."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, course_id, lesson_id, title, body) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def delete(self, entry_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(entry_id,) for entry_id in entry_ids],
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def build_query(self, text):
+        tokens = _TOKEN_RE.findall(text)
+        if not tokens:
+            return None
+        # Quote every term so user input can never be parsed as FTS5 syntax,
+        # and prefix-match the last one for search-as-you-type.
+        terms = ['"%s"' % token for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def rank(self, text, key, within):
+        """
+        Values of ``key`` (course_id or lesson_id) of the rows matching
+        ``text`` whose key is in the ``within`` subquery, best match first.
+        """
+        query = self.build_query(text)
+        if query is None:
+            return []
+        within_sql, within_params = within.query.sql_with_params()
+        with self.connection.cursor() as cursor:
+            # bm25() is lower-is-better; weight title matches over body text.
+            # It only works inside the full-text query itself, so LIMIT -1
+            # keeps SQLite from flattening that into the grouping query.
+            cursor.execute(
+                f"SELECT {key}, MIN(rank) AS best FROM ("
+                f"SELECT {key}, bm25({SEARCH_TABLE}, 10.0, 1.0) AS rank FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH %s AND {key} IN ({within_sql}) LIMIT -1"
+                f") GROUP BY {key} ORDER BY best, {key}",
+                [query, *within_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    create_sql = (
+        f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+        "id bigint PRIMARY KEY, course_id bigint NOT NULL, lesson_id bigint NULL, "
+        "document tsvector NOT NULL); "
+        f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx "
+        f"ON {SEARCH_TABLE} USING GIN (document)"
+    )
+    drop_sql = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def upsert(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (id, course_id, lesson_id, document) "
+                "VALUES (%s, %s, %s, setweight(to_tsvector('english', %s), 'A') "
+                "|| setweight(to_tsvector('english', %s), 'B')) "
+                "ON CONFLICT (id) DO UPDATE SET course_id = EXCLUDED.course_id, "
+                "lesson_id = EXCLUDED.lesson_id, document = EXCLUDED.document",
+                rows,
+            )
+
+    def delete(self, entry_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE id = ANY(%s)", [list(entry_ids)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def rank(self, text, key, within):
+        if not _TOKEN_RE.search(text):
+            return []
+        within_sql, within_params = within.query.sql_with_params()
+        with self.connection.cursor() as cursor:
+            # ts_rank() is higher-is-better; negate it to share bm25's ordering.
+            cursor.execute(
+                f"SELECT {key}, MIN(-ts_rank(document, query)) AS best "
+                f"FROM {SEARCH_TABLE}, websearch_to_tsquery('english', %s) query "
+                f"WHERE document @@ query AND {key} IN ({within_sql}) "
+                f"GROUP BY {key} ORDER BY best, {key}",
+                [text, *within_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    """Return the search backend for ``connection``, or None if its vendor has none."""
+    connection = connection or default_connection
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class(connection) if backend_class else None
+
+
+def index_courses(courses, connection=None):
+    backend = get_backend(connection)
+    if backend:
+        backend.upsert(
+            (course_entry_id(c.pk), c.pk, None, *course_document(c)) for c in courses
+        )
+
+
+def index_lessons(lessons, connection=None):
+    backend = get_backend(connection)
+    if backend:
+        backend.upsert(
+            (lesson_entry_id(l.pk), l.course_id, l.pk, *lesson_document(l)) for l in lessons
+        )
+
+
+def remove_course(course_id):
+    backend = get_backend()
+    if backend:
+        backend.delete([course_entry_id(course_id)])
+
+
+def remove_lessons(lesson_ids):
+    backend = get_backend()
+    if backend:
+        backend.delete([lesson_entry_id(pk) for pk in lesson_ids])
+
+
+def search_courses(text, courses):
+    """Return the ids of ``courses`` ranked by their best course or lesson match."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.rank(text, 'course_id', courses.order_by().values('pk'))
+
+
+def search_lessons(text, lessons):
+    """Return the ids of ``lessons`` ranked by relevance."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.rank(text, 'lesson_id', lessons.order_by().values('pk'))
@@ -1,9 +1,43 @@
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 from django.contrib.auth import get_user_model
+from lms.images import ImageVariantsField
 from .models import Category, Course, Lesson
 
 User = get_user_model()
 
+
+def parse_field_list(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Let read requests choose top-level fields with ``?fields=a,b`` and drop
+    them with ``?omit=c``. Views use ``selected_fields()`` to trim the SQL too.
+    """
+
+    @classmethod
+    def selected_fields(cls, request):
+        names = list(cls.Meta.fields)
+        fields = parse_field_list(request.query_params.get('fields'))
+        omit = parse_field_list(request.query_params.get('omit')) or set()
+        return [
+            name for name in names
+            if (fields is None or name in fields) and name not in omit
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        selected = set(self.selected_fields(request))
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -11,15 +45,17 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
-    course_count = serializers.SerializerMethodField(read_only=True)
+    course_count = serializers.IntegerField(source='published_course_count', read_only=True)
+    icon_variants = ImageVariantsField(source='icon')
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'icon', 'course_count', 'created_at']
+        fields = ['id', 'name', 'slug', 'description', 'icon', 'icon_variants', 'course_count', 'created_at']
         read_only_fields = ['slug', 'created_at']
-    
-    def get_course_count(self, obj):
-        return obj.courses.filter(is_published=True).count()
+
+
+LESSON_OUTLINE_FIELDS = ['id', 'title', 'order', 'duration', 'is_preview']
+COURSE_SUMMARY_FIELDS = ['id', 'title', 'slug', 'thumbnail']
 
 
 class LessonSerializer(serializers.ModelSerializer):
@@ -29,7 +65,13 @@ class LessonSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class LessonOutlineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lesson
+        fields = LESSON_OUTLINE_FIELDS
+
+
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     instructor = UserSerializer(read_only=True)
     instructor_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), 
@@ -37,20 +79,17 @@ class CourseSerializer(serializers.ModelSerializer):
         source='instructor'
     )
     category_name = serializers.CharField(source='category.name', read_only=True)
-    lesson_count = serializers.SerializerMethodField(read_only=True)
+    thumbnail_variants = ImageVariantsField(source='thumbnail')
     
     class Meta:
         model = Course
         fields = [
             'id', 'instructor', 'instructor_id', 'category', 'category_name',
-            'title', 'slug', 'description', 'thumbnail', 'price',
+            'title', 'slug', 'description', 'thumbnail', 'thumbnail_variants', 'price',
             'duration', 'level', 'requirements', 'what_will_you_learn',
             'is_published', 'lesson_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['slug', 'created_at', 'updated_at']
-    
-    def get_lesson_count(self, obj):
-        return obj.lessons.count()
+        read_only_fields = ['slug', 'lesson_count', 'created_at', 'updated_at']
     
     def validate_price(self, value):
         if value < 0:
@@ -59,13 +98,19 @@ class CourseSerializer(serializers.ModelSerializer):
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if not instance.category:
+        if 'category_name' in self.fields and not instance.category_id:
             representation['category_name'] = None
         return representation
 
 
+class CourseSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Course
+        fields = COURSE_SUMMARY_FIELDS
+
+
 class CourseDetailSerializer(CourseSerializer):
-    lessons = LessonSerializer(many=True, read_only=True)
+    lessons = LessonOutlineSerializer(many=True, read_only=True)
     
     class Meta(CourseSerializer.Meta):
         fields = CourseSerializer.Meta.fields + ['lessons']
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from lms.images import queue_variants
+
+from . import cache as catalog_cache
+from . import counters
+from . import search
+from .models import Category, Course, Lesson
+
+# Sent by bulk lesson writes, which bypass post_save. Arguments:
+# course_id, lessons (the saved instances) and created (bool).
+lessons_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_courses([instance])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_course(instance.pk)
+
+
+@receiver(post_save, sender=Lesson)
+def index_lesson(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_lessons([instance])
+
+
+@receiver(post_delete, sender=Lesson)
+def unindex_lesson(sender, instance, **kwargs):
+    search.remove_lessons([instance.pk])
+
+
+@receiver(post_save, sender=Course)
+def update_category_course_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_counted = not created and bool(instance.loaded_value('is_published')) \
+        and instance.loaded_value('category_id') is not None
+    old_category_id = instance.loaded_value('category_id') if was_counted else None
+    new_category_id = instance.category_id if instance.counts_towards_category else None
+    if old_category_id == new_category_id:
+        return
+    if old_category_id is not None:
+        counters.adjust_published_course_count(old_category_id, -1)
+    if new_category_id is not None:
+        counters.adjust_published_course_count(new_category_id, 1)
+
+
+@receiver(post_delete, sender=Course)
+def decrement_category_course_count(sender, instance, **kwargs):
+    if instance.counts_towards_category:
+        counters.adjust_published_course_count(instance.category_id, -1)
+
+
+@receiver(post_save, sender=Lesson)
+def update_course_lesson_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.adjust_lesson_count(instance.course_id, 1)
+        return
+    old_course_id = instance.loaded_value('course_id')
+    if old_course_id is not None and old_course_id != instance.course_id:
+        counters.adjust_lesson_count(old_course_id, -1)
+        counters.adjust_lesson_count(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Lesson)
+def decrement_course_lesson_count(sender, instance, **kwargs):
+    counters.adjust_lesson_count(instance.course_id, -1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_catalog_cache(sender, **kwargs):
+    # After commit: bumping earlier would let a concurrent request cache
+    # the old rows under the new version.
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+@receiver(lessons_bulk_changed, sender=Lesson)
+def sync_bulk_lessons(sender, course_id, lessons, created, **kwargs):
+    search.index_lessons(lessons)
+    # Also called for updates: a zero shift still moves the course's updated_at.
+    counters.adjust_lesson_count(course_id, len(lessons) if created else 0)
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+@receiver(post_save, sender=Course)
+def queue_thumbnail_variants(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        queue_variants(instance, 'thumbnail', created, update_fields)
+
+
+@receiver(post_save, sender=Category)
+def queue_icon_variants(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        queue_variants(instance, 'icon', created, update_fields)
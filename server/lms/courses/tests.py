@@ -1,3 +1,570 @@
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from PIL import Image
+from rest_framework.test import APIClient
+
+from enrollments.models import Enrollment
+from enrollments.services import complete_lesson
+from lms.images import generate_variants, variant_name
+from . import cache as catalog_cache, search
+from .models import Category, Course, Lesson
+from .serializers import LESSON_OUTLINE_FIELDS
+
+User = get_user_model()
+
+
+class CatalogQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.category = Category.objects.create(name='Programming')
+
+    def create_courses(self, count):
+        start = Course.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                course = Course.objects.create(
+                    instructor=self.instructor, category=self.category,
+                    title=f'Course {i}', slug=f'course-{i}', description='...',
+                    price=10, is_published=True
+                )
+                Lesson.objects.create(course=course, title='Intro', order=1)
+                Lesson.objects.create(course=course, title='Outro', order=2)
+
+    def assertQueryCountIsFlat(self, url, num, authenticate=False):
+        if authenticate:
+            self.client.force_authenticate(self.instructor)
+        for batch in (1, 10):
+            self.create_courses(batch)
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_course_list_query_count(self):
+        self.assertQueryCountIsFlat('/api/courses/courses/', 1)
+
+    def test_my_courses_query_count(self):
+        self.assertQueryCountIsFlat('/api/courses/courses/my_courses/', 1, authenticate=True)
+
+    def test_course_detail_query_count(self):
+        self.create_courses(1)
+        course = Course.objects.first()
+        for i in range(10):
+            Lesson.objects.create(course=course, title=f'Extra {i}', order=i + 3)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/courses/courses/{course.slug}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['lesson_count'], 12)
+        self.assertEqual(len(response.data['lessons']), 12)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        Course.objects.bulk_create([
+            Course(
+                instructor=instructor, title=f'Course {i}', slug=f'course-{i}',
+                description='...', price=0, is_published=True
+            ) for i in range(1150)
+        ])
+
+    def walk(self, url, direction):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(course['id'] for course in response.data['results'])
+            url = response.data[direction]
+            pages += 1
+        return ids, pages
+
+    def test_pages_through_tied_values_once(self):
+        ids, pages = self.walk('/api/courses/courses/?ordering=price&page_size=100', 'next')
+        self.assertEqual(pages, 12)
+        self.assertEqual(ids, sorted(Course.objects.values_list('id', flat=True)))
+
+        response = self.client.get('/api/courses/courses/?ordering=-price&page_size=100')
+        ids, _pages = self.walk(response.data['next'], 'next')
+        back, _pages = self.walk(self.client.get(response.data['next']).data['previous'], 'previous')
+        self.assertEqual(len(ids), 1050)
+        self.assertEqual(len(back), 100)
+        self.assertEqual(back, [course['id'] for course in response.data['results']])
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='A long description', price=10, is_published=True
+        )
+        Lesson.objects.create(course=self.course, title='Intro', order=1)
+        self.client.force_authenticate(self.instructor)
+
+    def test_fields_trim_keys_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/courses/courses/', {'fields': 'id,title,no_such_field'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        self.assertNotIn('"courses_course"."description"', queries[-1]['sql'])
+
+        response = self.client.get('/api/courses/courses/', {'fields': 'instructor'})
+        self.assertEqual(set(response.data['results'][0]), {'instructor'})
+        self.assertEqual(response.data['results'][0]['instructor']['username'], 'instructor')
+
+    def test_omit_drops_lessons_and_their_query(self):
+        url = f'/api/courses/courses/{self.course.slug}/'
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'omit': 'lessons,description,bogus'})
+        self.assertNotIn('lessons', response.data)
+        self.assertNotIn('description', response.data)
+        self.assertIn('title', response.data)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['lessons']), 1)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            instructor=instructor, category=self.category, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        self.url = f'/api/courses/courses/{self.course.slug}/'
+
+    def test_saves_bump_the_version_and_skip_stale_entries(self):
+        self.client.get(self.url)
+        # Only the ETag validator query; the body comes from the cache.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        for instance, field in ((self.course, 'title'), (self.lesson, 'title'), (self.category, 'name')):
+            version = catalog_cache.get_catalog_version()
+            with self.captureOnCommitCallbacks(execute=True):
+                setattr(instance, field, f'Renamed {field}')
+                instance.save()
+                # Not before the save commits.
+                self.assertEqual(catalog_cache.get_catalog_version(), version)
+            self.assertGreater(catalog_cache.get_catalog_version(), version)
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(response.data['title'], 'Renamed title')
+        self.assertEqual(response.data['lessons'][0]['title'], 'Renamed title')
+        stats = catalog_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 4))
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.python = Category.objects.create(name='Python')
+        self.web = Category.objects.create(name='Web')
+        self.course = Course.objects.create(
+            instructor=instructor, category=self.python, title='Course', slug='course',
+            description='...', price=10, is_published=False
+        )
+        self.other = Course.objects.create(
+            instructor=instructor, title='Other', slug='other', description='...', price=10
+        )
+
+    def counts(self):
+        self.python.refresh_from_db()
+        self.web.refresh_from_db()
+        return self.python.published_course_count, self.web.published_course_count
+
+    def test_publish_unpublish_and_category_change(self):
+        self.assertEqual(self.counts(), (0, 0))
+        self.course.is_published = True
+        self.course.save()
+        self.assertEqual(self.counts(), (1, 0))
+        self.course.category = self.web
+        self.course.save()
+        self.assertEqual(self.counts(), (0, 1))
+        self.course.is_published = False
+        self.course.save()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_lesson_move_and_recount(self):
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        lesson.course = self.other
+        lesson.save()
+        self.course.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.course.lesson_count, self.other.lesson_count), (0, 1))
+
+        Course.objects.update(lesson_count=7, enrollment_count=3, is_published=True)
+        out = StringIO()
+        call_command('recount_catalog', stdout=out)
+        self.assertIn('Recounted 2 courses and 2 categories', out.getvalue())
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.lesson_count, self.other.enrollment_count), (1, 0))
+        self.assertEqual(self.counts(), (1, 0))
+
+
+class BulkLessonTests(TestCase):
+    url = '/api/courses/lessons/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        Lesson.objects.create(course=self.course, title='Existing', order=1)
+        self.client.force_authenticate(self.instructor)
+
+    def test_bulk_create_counts_and_allocates_slots(self):
+        response = self.client.post(f'{self.url}bulk/', {
+            'course': self.course.id,
+            'lessons': [{'title': f'Lesson {i}', 'order': i + 2} for i in range(3)],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.lesson_count, 4)
+        self.assertEqual(
+            sorted(Lesson.objects.filter(course=self.course).values_list('slot', flat=True)), [0, 1, 2, 3]
+        )
+
+    def test_bulk_create_validates_items_and_permission(self):
+        response = self.client.post(f'{self.url}bulk/', {
+            'course': self.course.id, 'lessons': [{'title': 'No order'}, {'order': 3}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'{self.url}bulk/', {'course': self.course.id, 'lessons': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Lesson.objects.count(), 1)
+
+        other = User.objects.create_user(
+            email='other@example.com', username='other', password='secret-pass', role='instructor'
+        )
+        self.client.force_authenticate(other)
+        response = self.client.post(f'{self.url}bulk/', {
+            'course': self.course.id, 'lessons': [{'title': 'Sneaky', 'order': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_update_and_reorder(self):
+        first = Lesson.objects.get()
+        second = Lesson.objects.create(course=self.course, title='Second', order=2)
+        response = self.client.patch(f'{self.url}bulk/', {
+            'course': self.course.id, 'lessons': [{'id': second.id, 'title': 'Renamed'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual(second.title, 'Renamed')
+
+        response = self.client.patch(f'{self.url}bulk/', {
+            'course': self.course.id, 'lessons': [{'id': 999999, 'title': 'Missing'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        for order in ([second.id], [second.id, second.id], [second.id, first.id, 999999]):
+            response = self.client.post(f'{self.url}reorder/', {'course': self.course.id, 'order': order}, format='json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'{self.url}reorder/', {'course': self.course.id, 'order': [second.id, first.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Lesson.objects.filter(course=self.course).order_by('order').values_list('id', flat=True)),
+            [second.id, first.id],
+        )
+
+    def test_reorder_is_not_capped_by_the_bulk_limit(self):
+        Lesson.objects.bulk_create([Lesson(course=self.course, title=f'L{i}', order=i + 2) for i in range(500)])
+        ids = list(Lesson.objects.filter(course=self.course).order_by('-order').values_list('id', flat=True))
+        response = self.client.post(f'{self.url}reorder/', {'course': self.course.id, 'order': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Lesson.objects.filter(course=self.course).order_by('order').values_list('id', flat=True)), ids
+        )
+
+
+class LessonOutlineAndContentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lesson = Lesson.objects.create(course=self.course, title='Intro', order=1, content='x' * 100000)
+        self.client.force_authenticate(instructor)
+
+    def test_detail_carries_the_outline_only(self):
+        response = self.client.get(f'/api/courses/courses/{self.course.slug}/')
+        self.assertEqual(list(response.data['lessons'][0]), LESSON_OUTLINE_FIELDS)
+
+    def test_content_streams_and_revalidates(self):
+        url = f'/api/courses/lessons/{self.lesson.id}/content/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'x' * 100000)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.lesson.content = 'edited'
+        self.lesson.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(b''.join(response.streaming_content), b'edited')
+
+    def test_missing_or_invalid_lesson_is_404(self):
+        for pk in ('abc', '999999'):
+            self.assertEqual(self.client.get(f'/api/courses/lessons/{pk}/content/').status_code, 404)
+
+
+class CourseDetailConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.url = f'/api/courses/courses/{self.course.slug}/'
+
+    def test_matching_etag_returns_304_after_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_lesson_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        lesson.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class CourseProgressMapTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', username='student', password='secret-pass'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(30)
+        ]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        complete_lesson(self.enrollment, self.lessons[1].id)
+        self.client.force_authenticate(self.student)
+
+    def test_progress_map_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/courses/courses/{self.course.slug}/progress/')
+        self.assertEqual(response.status_code, 200)
+        lessons = response.data['lessons']
+        self.assertEqual(len(lessons), 30)
+        self.assertEqual([l['lesson_id'] for l in lessons if l['is_completed']], [self.lessons[1].id])
+        self.assertIsNotNone(lessons[1]['completed_at'])
+
+    def test_progress_counts_queued_completions(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            PROGRESS_WRITE_BEHIND=True, PROGRESS_FLUSH_INTERVAL=None,
+            PROGRESS_QUEUE_PATH=Path(directory) / 'queue.sqlite3',
+        ):
+            complete_lesson(self.enrollment, self.lessons[4].id)
+            response = self.client.get(f'/api/courses/courses/{self.course.slug}/progress/')
+        self.assertEqual(response.data['completed_lessons'], 2)
+        self.assertEqual(str(response.data['progress']), '6.67')
+        self.assertEqual(sum(l['is_completed'] for l in response.data['lessons']), 2)
+
+    def test_progress_embedded_in_detail_changes_etag(self):
+        url = f'/api/courses/courses/{self.course.slug}/?include=progress'
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['lesson_progress']), 30)
+
+        complete_lesson(self.enrollment, self.lessons[2].id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(l['is_completed'] for l in response.data['lesson_progress']), 2)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+
+    def create_course(self, title, description='...', is_published=True, **kwargs):
+        return Course.objects.create(
+            instructor=self.instructor, title=title, slug=title.lower().replace(' ', '-'),
+            description=description, price=10, is_published=is_published, **kwargs
+        )
+
+    def search(self, query, url='/api/courses/courses/'):
+        response = self.client.get(url, {'q': query, 'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_index_follows_saves_and_ranks_titles_first(self):
+        body = self.create_course('Containers', description='Running kubernetes clusters')
+        title = self.create_course('Kubernetes Basics')
+        self.assertEqual(self.search('kubernetes'), [title.id, body.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(course=title, title='Helm charts', order=1)
+        self.assertEqual(self.search('helm'), [title.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.course = body
+            lesson.save()
+        self.assertEqual(self.search('helm'), [body.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.delete()
+        self.assertEqual(self.search('helm'), [])
+
+    def test_hidden_drafts_do_not_crowd_out_visible_courses(self):
+        visible = self.create_course('Ops', description='Deploying to kubernetes')
+        draft = self.create_course('Draft', is_published=False)
+        Lesson.objects.bulk_create([
+            Lesson(course=draft, title=f'Kubernetes part {i}', order=i) for i in range(250)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('kubernetes'), [visible.id])
+
+    def test_results_are_not_capped(self):
+        Course.objects.bulk_create([
+            Course(
+                instructor=self.instructor, title=f'Rust {i}', slug=f'rust-{i}',
+                description='...', price=10, is_published=True
+            ) for i in range(230)
+        ])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 230 courses', out.getvalue())
+        ranked = search.search_courses('rust', Course.objects.all())
+        self.assertEqual(len(ranked), 230)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=media.name, BACKGROUND_TASKS_EAGER=True, IMAGE_VARIANT_WIDTHS=(64, 256),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+
+    def upload(self, size=(1000, 500)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'navy').save(buffer, format='PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                instructor=self.instructor, title='Course', slug='course', description='...',
+                price=10, is_published=True,
+                thumbnail=SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png'),
+            )
+        return course.thumbnail.name
+
+    def test_upload_writes_a_webp_variant_per_width(self):
+        name = self.upload()
+        for width, height in [(64, 32), (256, 128)]:
+            with default_storage.open(variant_name(name, width), 'rb') as variant:
+                image = Image.open(variant)
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, (width, height))
+
+    def test_existing_variant_is_served_immutable(self):
+        name = self.upload()
+
+        response = self.client.get(f'/media/{variant_name(name, 64)}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (64, 32))
+
+    def test_pending_variant_redirects_to_the_original_uncached(self):
+        name = self.upload()
+        default_storage.delete(variant_name(name, 64))
+
+        response = self.client.get(f'/media/{variant_name(name, 64)}')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], default_storage.url(name))
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_missing_or_malformed_variant_is_404(self):
+        self.assertEqual(self.client.get('/media/derivatives/course_thumbnails/gone.png.64.webp').status_code, 404)
+        self.assertEqual(self.client.get('/media/derivatives/no-width').status_code, 404)
+
+    def test_backfill_is_idempotent(self):
+        name = self.upload()
+        default_storage.delete(variant_name(name, 256))
+
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Wrote 1 variants (0 originals failed)', out.getvalue())
+        self.assertTrue(default_storage.exists(variant_name(name, 256)))
 
-# Create your tests here.
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Wrote 0 variants', out.getvalue())
+        self.assertEqual(generate_variants(name), 0)
@@ -1,13 +1,31 @@
+import hashlib
+
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
-from django.db.models import Count, Q
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, OuterRef, Prefetch, Q, Subquery, Value, When
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 
+from . import cache as catalog_cache
+from . import search
 from .models import Category, Course, Lesson
-from .serializers import CategorySerializer, CourseSerializer, CourseDetailSerializer, LessonSerializer
-from enrollments.models import Enrollment, CourseProgress
+from .serializers import (
+    CategorySerializer, CourseSerializer, CourseDetailSerializer, LessonSerializer,
+    LessonCreateUpdateSerializer, LESSON_OUTLINE_FIELDS, parse_field_list,
+)
+from .signals import lessons_bulk_changed
+from enrollments.models import Enrollment
+from enrollments import write_behind
+from enrollments.services import (
+    complete_lesson, expected_progress, is_lesson_completed, lesson_progress_map, pending_completions,
+)
+from lms.pagination import CoursePagination, LessonPagination
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -23,21 +41,71 @@ class IsInstructorOrReadOnly(permissions.BasePermission):
             return True
         return obj.instructor == request.user
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.annotate(course_count=Count('courses'))
+def filter_by_search_rank(queryset, ranked_ids, fallback):
+    """
+    Restrict ``queryset`` to ``ranked_ids`` and annotate each row with its
+    position as ``search_rank``. ``fallback`` filters the queryset instead
+    when the database has no full-text backend (``ranked_ids`` is None).
+    """
+    if ranked_ids is None:
+        return fallback(queryset)
+    ranking = Case(
+        *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked_ids)],
+        default=Value(len(ranked_ids)),
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ranked_ids).annotate(search_rank=ranking)
+
+
+MAX_BULK_LESSONS = 500
+
+
+def iter_chunks(text, size=64 * 1024):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class CatalogCacheMixin:
+    """Serve anonymous list and retrieve requests from the versioned catalog cache."""
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = catalog_cache.make_key(f'{self.basename}-{self.action}', request, **kwargs)
+        data = catalog_cache.get_cached(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            catalog_cache.set_cached(key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
     lookup_field = 'slug'
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsInstructorOrReadOnly]
     lookup_field = 'slug'
+    pagination_class = CoursePagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'price']
+    deferrable_fields = ['description', 'requirements', 'what_will_you_learn']
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -45,12 +113,37 @@ class CourseViewSet(viewsets.ModelViewSet):
         return CourseSerializer
 
     def get_queryset(self):
-        queryset = Course.objects.all()
+        queryset = Course.objects.with_catalog_data()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.apply_sparse_fieldset(queryset)
         category_slug = self.request.query_params.get('category', None)
         
         if category_slug:
             queryset = queryset.filter(category__slug=category_slug)
 
+        queryset = self.filter_visible(queryset)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = filter_by_search_rank(
+                queryset, search.search_courses(query, queryset),
+                lambda qs: qs.filter(Q(title__icontains=query) | Q(description__icontains=query))
+            )
+        return queryset
+
+    def apply_sparse_fieldset(self, queryset):
+        """Leave unrequested text columns and lessons out of the SQL as well."""
+        selected = self.get_serializer_class().selected_fields(self.request)
+        deferred = [name for name in self.deferrable_fields if name not in selected]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        if 'lessons' in selected:
+            # Course detail only carries the outline; bodies come from
+            # LessonViewSet.content, so never load them here.
+            outline = Lesson.objects.only('course_id', *LESSON_OUTLINE_FIELDS)
+            queryset = queryset.prefetch_related(Prefetch('lessons', queryset=outline))
+        return queryset
+
+    def filter_visible(self, queryset):
         user = self.request.user
 
         if not user.is_authenticated:
@@ -61,25 +154,158 @@ class CourseViewSet(viewsets.ModelViewSet):
             
         return queryset.filter(Q(is_published=True) | Q(instructor=user))
 
+    def embeds_progress(self):
+        """``?include=progress`` adds the user's lesson progress map to course detail."""
+        return (
+            self.request.user.is_authenticated
+            and 'progress' in (parse_field_list(self.request.query_params.get('include')) or ())
+        )
+
+    def get_conditional_validators(self):
+        """
+        Compute the ETag and Last-Modified of a course detail response with a
+        single aggregate query, before anything is serialized.
+        """
+        state = self.filter_visible(Course.objects.filter(slug=self.kwargs['slug'])).values(
+            'id', 'updated_at', 'is_published'
+        ).annotate(
+            lessons_updated_at=Max('lessons__updated_at'),
+            lessons_total=Count('lessons'),
+        )
+        if self.embeds_progress():
+            # The embedded map changes whenever this user's counter moves.
+            state = state.annotate(own_completed_lessons=Subquery(
+                Enrollment.objects.filter(course=OuterRef('id'), student=self.request.user)
+                .values('completed_lessons')[:1]
+            ))
+        state = state.order_by().first()
+        if state is None:
+            return None
+
+        last_modified = max(filter(None, [state['updated_at'], state['lessons_updated_at']]))
+        own_progress = None
+        if 'own_completed_lessons' in state:
+            own_progress = (self.request.user.id, state['own_completed_lessons'])
+            if write_behind.is_enabled():
+                own_progress += (len(write_behind.get_queue().pending_lessons(
+                    self.request.user.id, state['id'])),)
+        fingerprint = repr((
+            state['id'], state['updated_at'].isoformat(), state['lessons_total'],
+            state['lessons_updated_at'] and state['lessons_updated_at'].isoformat(),
+            sorted(self.request.query_params.lists()), own_progress,
+        ))
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        return etag, last_modified, state['is_published']
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_conditional_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified, is_published = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+            if self.embeds_progress():
+                enrollment = Enrollment.objects.filter(
+                    student=request.user, course__slug=kwargs['slug']
+                ).first()
+                response.data['lesson_progress'] = enrollment and lesson_progress_map(enrollment)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        if is_published and not request.user.is_authenticated:
+            patch_cache_control(response, public=True, max_age=settings.CATALOG_HTTP_MAX_AGE)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
     def perform_create(self, serializer):
         serializer.save(instructor=self.request.user)
 
     @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated])
     def my_courses(self, request):
-        courses = Course.objects.filter(instructor=request.user)
+        courses = self.apply_sparse_fieldset(Course.objects.with_catalog_data()).filter(instructor=request.user)
         serializer = self.get_serializer(courses, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['GET'], url_path='progress', permission_classes=[permissions.IsAuthenticated])
+    def progress(self, request, slug=None):
+        """Completion state of every lesson of the course for the current user."""
+        enrollment = Enrollment.objects.filter(student=request.user, course__slug=slug).first()
+        if not enrollment:
+            return Response({"detail": "You are not enrolled in this course."}, status=status.HTTP_403_FORBIDDEN)
+        lessons = lesson_progress_map(enrollment)
+        progress, completed = enrollment.progress, enrollment.completed_lessons
+        if write_behind.is_enabled():
+            # The map already merges queued completions; count from it too.
+            completed = sum(lesson['is_completed'] for lesson in lessons)
+            progress = expected_progress(completed, len(lessons))
+        return Response({
+            "course": enrollment.course_id,
+            "progress": progress,
+            "completed_lessons": completed,
+            "lessons": lessons,
+        })
+
+    @action(detail=False, methods=['GET'], url_path='cache-stats', permission_classes=[permissions.IsAuthenticated])
+    def cache_stats(self, request):
+        if getattr(request.user, 'role', None) != 'admin':
+            raise PermissionDenied("Only admins can view cache statistics.")
+        return Response(catalog_cache.get_stats())
+
 class LessonViewSet(viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LessonPagination
 
     def get_queryset(self):
+        queryset = self.queryset
         course_slug = self.request.query_params.get('course_slug', None)
         if course_slug:
-            return self.queryset.filter(course__slug=course_slug)
-        return self.queryset
+            queryset = queryset.filter(course__slug=course_slug)
+
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = filter_by_search_rank(
+                queryset, search.search_lessons(query, queryset),
+                lambda qs: qs.filter(Q(title__icontains=query) | Q(content__icontains=query))
+            )
+        return queryset
+
+    @action(detail=True, methods=['get'], url_path='content')
+    def content(self, request, pk=None):
+        """
+        Stream a lesson body as text. Bodies are cached per lesson under a key
+        that includes ``updated_at``, so an edit never serves a stale copy.
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        updated_at = self.get_queryset().filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            raise NotFound()
+
+        etag = quote_etag(f'lesson-{pk}-{updated_at.timestamp()}')
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(updated_at.timestamp())
+        )
+        if response is None:
+            body = catalog_cache.get_lesson_content(pk, updated_at)
+            if body is None:
+                body = Lesson.objects.filter(pk=pk).values_list('content', flat=True).first() or ''
+                catalog_cache.set_lesson_content(pk, updated_at, body)
+            response = StreamingHttpResponse(
+                iter_chunks(body), content_type='text/plain; charset=utf-8'
+            )
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(updated_at.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     @action(detail=True, methods=['get'], url_path='progress')
     def progress(self, request, pk=None):
@@ -88,50 +314,135 @@ class LessonViewSet(viewsets.ModelViewSet):
         if not enrollment:
             return Response({"detail": "You are not enrolled in this course."}, status=status.HTTP_403_FORBIDDEN)
         
-        progress = CourseProgress.objects.filter(enrollment=enrollment, lesson=lesson).first()
-        return Response({"is_completed": bool(progress and progress.is_completed)})
+        is_completed = is_lesson_completed(enrollment, lesson)
+        if not is_completed:
+            is_completed = lesson.id in pending_completions(enrollment)
+        return Response({"is_completed": is_completed})
 
     @action(detail=True, methods=['post'], url_path='complete')
     def complete(self, request, pk=None):
         lesson = self.get_object()
-        enrollment = Enrollment.objects.filter(student=request.user, course=lesson.course).first()
+        enrollment = Enrollment.objects.filter(student=request.user, course_id=lesson.course_id).first()
         
         if not enrollment:
             return Response({"detail": "You are not enrolled in this course."}, status=status.HTTP_403_FORBIDDEN)
             
-        progress, created = CourseProgress.objects.get_or_create(enrollment=enrollment, lesson=lesson)
-        
-        if not progress.is_completed:
-            progress.is_completed = True
-            progress.completed_at = timezone.now()
-            progress.save()
-            
-            total_lessons = enrollment.course.lessons.count()
-            completed_lessons = enrollment.lesson_progress.filter(is_completed=True).count()
-            
-            if total_lessons > 0:
-                enrollment.progress = (completed_lessons / total_lessons) * 100
-                if enrollment.progress == 100:
-                    enrollment.status = 'completed'
-                    enrollment.completed_at = timezone.now()
-                enrollment.save()
-                
+        enrollment = complete_lesson(enrollment, lesson.id)
         return Response({
             "message": "Lesson marked as completed", 
             "course_progress": enrollment.progress
         })
 
-    def perform_create(self, serializer):
-        course_id = self.request.data.get('course')
+    def get_managed_course(self, course_id):
+        """Return the course if the current user may edit its lessons."""
         try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
+            course = Course.objects.only('id', 'instructor_id').get(id=course_id)
+        except (Course.DoesNotExist, ValueError, TypeError):
             raise PermissionDenied("Course not found.")
 
-        is_instructor = (course.instructor == self.request.user)
+        is_instructor = (course.instructor_id == self.request.user.id)
         is_admin = (getattr(self.request.user, 'role', None) == 'admin')
         
         if not (is_instructor or is_admin):
             raise PermissionDenied("You are not the instructor of this course.")
-            
-        serializer.save()
\ No newline at end of file
+        return course
+
+    def get_bulk_items(self, request, key, limit=MAX_BULK_LESSONS):
+        items = request.data.get(key)
+        if not isinstance(items, list) or not items:
+            raise ValidationError({key: "Expected a non-empty list."})
+        if limit is not None and len(items) > limit:
+            raise ValidationError({key: f"At most {limit} items per request."})
+        return items
+
+    def get_bulk_serializer(self, items, partial=False):
+        serializer = LessonCreateUpdateSerializer(data=items, many=True, partial=partial)
+        # The course is checked once for the whole batch; without this field
+        # every item would look it up again.
+        serializer.child.fields.pop('course')
+        return serializer
+
+    def perform_create(self, serializer):
+        course = self.get_managed_course(self.request.data.get('course'))
+        serializer.save(course=course)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Create many lessons of one course: ``{"course": id, "lessons": [...]}``."""
+        course = self.get_managed_course(request.data.get('course'))
+        items = self.get_bulk_items(request, 'lessons')
+
+        serializer = self.get_bulk_serializer(items)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            first_slot = Course.objects.allocate_lesson_slots(course.id, len(serializer.validated_data))
+            lessons = Lesson.objects.bulk_create([
+                Lesson(course=course, slot=first_slot + i, **data)
+                for i, data in enumerate(serializer.validated_data)
+            ])
+            lessons_bulk_changed.send(sender=Lesson, course_id=course.id, lessons=lessons, created=True)
+
+        return Response(LessonSerializer(lessons, many=True).data, status=status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """Patch many lessons of one course: ``{"course": id, "lessons": [{"id": ..., ...}]}``."""
+        course = self.get_managed_course(request.data.get('course'))
+        items = self.get_bulk_items(request, 'lessons')
+
+        serializer = self.get_bulk_serializer(items, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            ids = [int(item['id']) for item in items]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError({"lessons": "Every item needs an integer id."})
+        if len(set(ids)) != len(ids):
+            raise ValidationError({"lessons": "Each lesson may appear only once."})
+
+        lessons = Lesson.objects.filter(course=course).in_bulk(ids)
+        missing = [pk for pk in ids if pk not in lessons]
+        if missing:
+            raise ValidationError({"lessons": f"Unknown lessons for this course: {missing}"})
+
+        now = timezone.now()
+        changed_fields = {'updated_at'}
+        for pk, data in zip(ids, serializer.validated_data):
+            for field, value in data.items():
+                setattr(lessons[pk], field, value)
+                changed_fields.add(field)
+            lessons[pk].updated_at = now
+
+        updated = [lessons[pk] for pk in ids]
+        with transaction.atomic():
+            Lesson.objects.bulk_update(updated, sorted(changed_fields))
+            lessons_bulk_changed.send(sender=Lesson, course_id=course.id, lessons=updated, created=False)
+
+        return Response(LessonSerializer(updated, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='reorder')
+    def reorder(self, request):
+        """Set lesson order from a list of ids: ``{"course": id, "order": [id, ...]}``."""
+        course = self.get_managed_course(request.data.get('course'))
+        # Reordering lists the whole course, however many lessons it has; the
+        # ids are checked against its lessons below.
+        ids = self.get_bulk_items(request, 'order', limit=None)
+
+        lessons = Lesson.objects.filter(course=course).only('id', 'course_id', 'order').in_bulk()
+        if sorted(map(str, ids)) != sorted(map(str, lessons)):
+            raise ValidationError({"order": "List every lesson of the course exactly once."})
+
+        now = timezone.now()
+        reordered = []
+        for position, pk in enumerate(ids, start=1):
+            lesson = lessons[int(pk)]
+            lesson.order = position
+            lesson.updated_at = now
+            reordered.append(lesson)
+
+        with transaction.atomic():
+            Lesson.objects.bulk_update(reordered, ['order', 'updated_at'])
+            lessons_bulk_changed.send(sender=Lesson, course_id=course.id, lessons=reordered, created=False)
+
+        return Response([{"id": lesson.id, "order": lesson.order} for lesson in reordered])
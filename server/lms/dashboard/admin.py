@@ -1,3 +1,7 @@
 from django.contrib import admin
+from .models import DashboardStat
 
-# Register your models here.
+@admin.register(DashboardStat)
+class DashboardStatAdmin(admin.ModelAdmin):
+    list_display = ['metric', 'dimension', 'value', 'updated_at']
+    list_filter = ['metric']
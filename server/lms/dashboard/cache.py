@@ -0,0 +1,112 @@
+"""
+Short-lived cache of dashboard payloads and course funnels.
+
+Payloads are keyed by role, user id and a per-user version; admin payloads
+share one global version and funnels have one per course. Changes to a
+user's enrollments or courses, or new completions in a course, bump the
+matching versions (see dashboard.signals), so the next request recomputes.
+
+Recomputation is single-flight: the first request to miss takes a lock
+with ``cache.add()`` and computes, while concurrent requests for the same
+key wait for its result instead of recomputing too. With a per-process
+cache backend (the default LocMemCache) that only holds within a process;
+configure a shared backend to coalesce across workers.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from lms.cache_versions import bump_version, get_version, incr
+
+HITS_KEY = 'dashboard:hits'
+MISSES_KEY = 'dashboard:misses'
+WAITS_KEY = 'dashboard:waits'
+RECOMPUTES_KEY = 'dashboard:recomputes'
+RECOMPUTE_MS_KEY = 'dashboard:recompute-ms'
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+
+
+def version_key(scope):
+    return f'dashboard:version:{scope}'
+
+
+def bump(*scopes):
+    """
+    Bump these versions once the current transaction commits; bumping
+    earlier would let a concurrent request cache pre-commit data under
+    the new version.
+    """
+    scopes = set(scopes)
+
+    def bump_all():
+        for scope in scopes:
+            bump_version(version_key(scope))
+
+    transaction.on_commit(bump_all)
+
+
+def invalidate(*user_ids):
+    """Bump the dashboard version of these users, or the admin one for None."""
+    bump(*('admin' if user_id is None else f'user:{user_id}' for user_id in user_ids))
+
+
+def invalidate_courses(*course_ids):
+    """Bump the version of these courses' lesson funnels."""
+    bump(*(f'course:{course_id}' for course_id in course_ids))
+
+
+def make_key(role, user):
+    scope = 'admin' if role == 'admin' else f'user:{user.pk}'
+    return f'dashboard:{role}:{user.pk}:{get_version(version_key(scope))}'
+
+
+def funnel_key(course_id):
+    return f'dashboard:funnel:{course_id}:{get_version(version_key(f"course:{course_id}"))}'
+
+
+def get_or_compute(key, compute):
+    """Return the cached value of ``key``, computing it at most once at a time."""
+    data = cache.get(key)
+    if data is not None:
+        incr(HITS_KEY)
+        return data
+    incr(MISSES_KEY)
+
+    lock = f'{key}:lock'
+    if not cache.add(lock, 1, timeout=LOCK_TIMEOUT):
+        incr(WAITS_KEY)
+        deadline = time.monotonic() + getattr(settings, 'DASHBOARD_CACHE_WAIT', 5)
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        # The holder is slow or gone; compute without the lock.
+
+    started = time.perf_counter()
+    try:
+        data = compute()
+        cache.set(key, data, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 30))
+    finally:
+        cache.delete(lock)
+    incr(RECOMPUTES_KEY)
+    incr(RECOMPUTE_MS_KEY, round((time.perf_counter() - started) * 1000))
+    return data
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    recomputes = cache.get(RECOMPUTES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'coalesced_waits': cache.get(WAITS_KEY, 0),
+        'recomputes': recomputes,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+        'avg_recompute_ms': round(cache.get(RECOMPUTE_MS_KEY, 0) / recomputes, 1) if recomputes else 0.0,
+    }
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from courses.models import Course
+from dashboard.views import InstructorDashboardSummaryView, StudentDashboardSummaryView
+from enrollments.models import Enrollment
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Time the instructor and student dashboards while the enrollments of one instructor grow. '
+            'Fixture rows are created in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,10000,100000',
+                            help='Comma-separated enrollment counts to measure at.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.factory = APIRequestFactory()
+        self.stdout.write(f'{"enrollments":>12} {"view":>10} {"queries":>8} {"median ms":>10}')
+        with transaction.atomic():
+            instructor = User.objects.create_user(
+                email='bench-instructor@example.com', username='bench-instructor', role='instructor'
+            )
+            course = Course.objects.create(
+                instructor=instructor, title='Benchmark', slug='benchmark-dashboards',
+                description='...', price=0, is_published=True,
+            )
+            enrolled = 0
+            for size in sizes:
+                self.enroll(course, enrolled, size)
+                enrolled = size
+                student = Enrollment.objects.filter(course=course).select_related('student').first().student
+                for name, view, user in (
+                    ('instructor', InstructorDashboardSummaryView, instructor),
+                    ('student', StudentDashboardSummaryView, student),
+                ):
+                    queries, median = self.measure(view, user, options['repeat'])
+                    self.stdout.write(f'{size:>12} {name:>10} {queries:>8g} {median:>10.1f}')
+            transaction.set_rollback(True)
+
+    def enroll(self, course, start, stop, chunk_size=5000):
+        for first in range(start, stop, chunk_size):
+            numbers = range(first, min(first + chunk_size, stop))
+            students = User.objects.bulk_create([
+                User(email=f'bench-{n}@example.com', username=f'bench-{n}', password='!')
+                for n in numbers
+            ])
+            Enrollment.objects.bulk_create([
+                Enrollment(student=student, course=course, progress=n % 101)
+                for n, student in zip(numbers, students)
+            ])
+
+    def measure(self, view_class, user, repeat):
+        """
+        Time the payload computation itself: the views serve repeat requests
+        from the dashboard cache, which would only measure cache hits.
+        Returns (queries per call, summed over every repeat, median ms).
+        """
+        view = view_class()
+        renderer = JSONRenderer()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                request = self.factory.get('/')
+                request.user = user
+                started = time.perf_counter()
+                renderer.render(view.get_payload(request))
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(queries) / repeat, statistics.median(timings)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard import stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard statistics table and fix any drift. Run periodically, e.g. nightly.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = stats.reconcile()
+        for (metric, dimension), (old, new) in sorted(drift.items()):
+            self.stdout.write(f'{metric}[{dimension}]: {old} -> {new}')
+        self.stdout.write(self.style.SUCCESS(f'Reconciled dashboard stats; {len(drift)} corrected.'))
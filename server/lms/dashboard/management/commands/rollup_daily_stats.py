@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from dashboard import rollups
+
+
+class Command(BaseCommand):
+    help = ('Roll up daily enrollment, completion, cancellation and lesson-completion counts '
+            'per course and category. Only new days are processed; run it daily from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Last day to roll up (YYYY-MM-DD); defaults to yesterday.')
+        parser.add_argument('--lookback', type=int, default=rollups.LOOKBACK_DAYS,
+                            help='Already rolled-up trailing days to recompute for late writes.')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute everything since the first enrollment.')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = parse_date(options['until'])
+            if until is None:
+                raise CommandError('--until must be a date, YYYY-MM-DD.')
+            if until >= timezone.localdate():
+                until = timezone.localdate() - timedelta(days=1)
+        if options['rebuild']:
+            rollups.RollupCursor.objects.filter(name=rollups.CURSOR_NAME).delete()
+
+        processed = rollups.rollup_new_days(until, options['lookback'])
+        if processed is None:
+            self.stdout.write('Nothing to roll up.')
+            return
+        first, last = processed
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {first} through {last}.'))
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 17:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_stats(apps, schema_editor):
+    DashboardStat = apps.get_model('dashboard', 'DashboardStat')
+    counts = {
+        ('courses', ''): apps.get_model('courses', 'Course').objects.count(),
+        ('categories', ''): apps.get_model('courses', 'Category').objects.count(),
+    }
+    User = apps.get_model('users', 'User')
+    for role, count in User.objects.order_by().values_list('role').annotate(Count('pk')):
+        counts['users', role] = count
+    for name in ('Enrollment', 'ArchivedEnrollment'):
+        Model = apps.get_model('enrollments', name)
+        for status, count in Model.objects.order_by().values_list('status').annotate(Count('pk')):
+            counts['enrollments', status] = counts.get(('enrollments', status), 0) + count
+    DashboardStat.objects.bulk_create([
+        DashboardStat(metric=metric, dimension=dimension, value=value)
+        for (metric, dimension), value in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0007_lesson_slots'),
+        ('enrollments', '0006_archive'),
+        ('users', '0004_passwordresetotp_delete_passwordresettoken_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('dimension', models.CharField(blank=True, default='', max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['metric', 'dimension'],
+                'unique_together': {('metric', 'dimension')},
+            },
+        ),
+        migrations.RunPython(seed_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,65 @@
 from django.db import models
 
-# Create your models here.
+
+class DashboardStat(models.Model):
+    """
+    A running count behind the dashboards, e.g. ('users', 'student') or
+    ('enrollments', 'completed'). Kept current by dashboard.signals and
+    corrected by ``manage.py reconcile_dashboard_stats``.
+    """
+    metric = models.CharField(max_length=50)
+    dimension = models.CharField(max_length=50, blank=True, default='')
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('metric', 'dimension')
+        ordering = ['metric', 'dimension']
+
+    def __str__(self):
+        return f"{self.metric}[{self.dimension}] = {self.value}"
+
+
+class DailyCounts(models.Model):
+    day = models.DateField()
+    enrolled = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    lessons_completed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class CourseDailyStats(DailyCounts):
+    """Per-course activity of one day, written by ``manage.py rollup_daily_stats``."""
+    course = models.ForeignKey('courses.Course', on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        unique_together = ('course', 'day')
+        ordering = ['day']
+        indexes = [models.Index(fields=['day'])]
+
+    def __str__(self):
+        return f"{self.course_id} on {self.day}"
+
+
+class CategoryDailyStats(DailyCounts):
+    """The sum of CourseDailyStats over a category's courses."""
+    category = models.ForeignKey('courses.Category', on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        unique_together = ('category', 'day')
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.category_id} on {self.day}"
+
+
+class RollupCursor(models.Model):
+    """The last day a rollup has been computed through."""
+    name = models.CharField(max_length=50, unique=True)
+    day = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} through {self.day}"
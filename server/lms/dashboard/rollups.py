@@ -0,0 +1,123 @@
+"""
+Daily activity rollups.
+
+CourseDailyStats holds, per course and day, how many enrollments started,
+completed and were cancelled, and how many lessons were completed;
+CategoryDailyStats sums those per category. ``rollup()`` recomputes a range
+of whole days with grouped queries (live and archived rows alike) and
+replaces their rows, so rerunning a day is harmless. ``rollup_new_days()``
+continues from the stored cursor, re-rolling a few trailing days to pick up
+late writes such as offline completions synced after midnight.
+
+Lessons completed per day come from CourseProgress timestamps. With bitmap
+progress storage and no history rows (``PROGRESS_HISTORY_ROWS``), a
+completion leaves only a bit and a counter, with no day to attribute it to,
+so the metric can't be derived and ``reported_fields()`` leaves it out.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from enrollments.models import ArchivedCourseProgress, ArchivedEnrollment, CourseProgress, Enrollment
+from enrollments.services import keeps_progress_rows
+from .models import CategoryDailyStats, CourseDailyStats, RollupCursor
+
+CURSOR_NAME = 'daily-stats'
+LOOKBACK_DAYS = 2
+WINDOW_DAYS = 31
+COUNT_FIELDS = ['enrolled', 'completed', 'cancelled', 'lessons_completed']
+
+# (model, timestamp field, path to the course id, counter)
+SOURCES = [
+    (Enrollment, 'enrolled_at', 'course_id', 'enrolled'),
+    (ArchivedEnrollment, 'enrolled_at', 'course_id', 'enrolled'),
+    (Enrollment, 'completed_at', 'course_id', 'completed'),
+    (ArchivedEnrollment, 'completed_at', 'course_id', 'completed'),
+    (Enrollment, 'cancelled_at', 'course_id', 'cancelled'),
+    (ArchivedEnrollment, 'cancelled_at', 'course_id', 'cancelled'),
+    (CourseProgress, 'completed_at', 'enrollment__course_id', 'lessons_completed'),
+    (ArchivedCourseProgress, 'completed_at', 'enrollment__course_id', 'lessons_completed'),
+]
+
+
+def reported_fields():
+    """The counters with data behind them in the current progress storage."""
+    if keeps_progress_rows():
+        return COUNT_FIELDS
+    return [name for name in COUNT_FIELDS if name != 'lessons_completed']
+
+
+def start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rollup(first_day, last_day):
+    """Recompute the rollups of ``first_day`` through ``last_day``. Returns the course rows written."""
+    counts = {}
+    for model, field, course_path, counter in SOURCES:
+        rows = model.objects.filter(**{
+            f'{field}__gte': start_of(first_day), f'{field}__lt': start_of(last_day + timedelta(days=1)),
+        })
+        if model in (CourseProgress, ArchivedCourseProgress):
+            rows = rows.filter(is_completed=True)
+        rows = rows.annotate(day=TruncDate(field)).order_by().values_list(course_path, 'day').annotate(n=Count('pk'))
+        for course_id, day, n in rows:
+            counts.setdefault((course_id, day), dict.fromkeys(COUNT_FIELDS, 0))[counter] += n
+
+    with transaction.atomic():
+        CourseDailyStats.objects.filter(day__range=(first_day, last_day)).delete()
+        CourseDailyStats.objects.bulk_create([
+            CourseDailyStats(course_id=course_id, day=day, **values)
+            for (course_id, day), values in counts.items()
+        ], batch_size=1000)
+        CategoryDailyStats.objects.filter(day__range=(first_day, last_day)).delete()
+        per_category = CourseDailyStats.objects.filter(
+            day__range=(first_day, last_day), course__category__isnull=False,
+        ).order_by().values('course__category_id', 'day').annotate(
+            **{name: Sum(name) for name in COUNT_FIELDS}
+        )
+        CategoryDailyStats.objects.bulk_create([
+            CategoryDailyStats(category_id=row.pop('course__category_id'), **row) for row in per_category
+        ], batch_size=1000)
+    return len(counts)
+
+
+def first_activity_day():
+    first = [
+        model.objects.aggregate(first=Min('enrolled_at'))['first']
+        for model in (Enrollment, ArchivedEnrollment)
+    ]
+    first = [value for value in first if value]
+    return timezone.localdate(min(first)) if first else None
+
+
+def rollup_new_days(until=None, lookback=LOOKBACK_DAYS):
+    """
+    Roll up every whole day since the cursor through ``until`` (yesterday
+    by default), ``WINDOW_DAYS`` at a time. Returns ``(first day, last day)``
+    processed, or None if there was nothing to do.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    cursor = RollupCursor.objects.filter(name=CURSOR_NAME).first()
+    if cursor:
+        start = cursor.day + timedelta(days=1) - timedelta(days=lookback)
+    else:
+        start = first_activity_day()
+    if start is None or start > until:
+        return None
+
+    day = start
+    while day <= until:
+        last = min(day + timedelta(days=WINDOW_DAYS - 1), until)
+        rollup(day, last)
+        RollupCursor.objects.update_or_create(name=CURSOR_NAME, defaults={'day': last})
+        day = last + timedelta(days=1)
+    return start, until
+
+
+def rolled_up_through():
+    cursor = RollupCursor.objects.filter(name=CURSOR_NAME).first()
+    return cursor and cursor.day
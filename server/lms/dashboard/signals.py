@@ -0,0 +1,114 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Category, Course, Lesson
+from courses.signals import lessons_bulk_changed
+from enrollments import archive
+from enrollments.models import Enrollment
+from enrollments.signals import enrollment_statuses_changed, enrollments_updated
+from users.models import User
+
+from . import cache as dashboard_cache, stats
+
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.adjust(stats.USERS, instance.role, 1)
+        return
+    old_role = instance.loaded_value('role')
+    if old_role is not None and old_role != instance.role:
+        stats.adjust_many(stats.USERS, {old_role: -1, instance.role: 1})
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    stats.adjust(stats.USERS, instance.role, -1)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Category)
+def count_catalog_item(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(stats.COURSES if sender is Course else stats.CATEGORIES, '', 1)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Category)
+def uncount_catalog_item(sender, instance, **kwargs):
+    stats.adjust(stats.COURSES if sender is Course else stats.CATEGORIES, '', -1)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.adjust(stats.ENROLLMENTS, instance.status, 1)
+        return
+    old_status = instance.loaded_value('status')
+    if old_status is not None and old_status != instance.status:
+        stats.adjust_many(stats.ENROLLMENTS, {old_status: -1, instance.status: 1})
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    # Archived enrollments still count.
+    if not archive.is_archiving():
+        stats.adjust(stats.ENROLLMENTS, instance.status, -1)
+
+
+@receiver(enrollment_statuses_changed, sender=Enrollment)
+def count_enrollment_statuses(sender, deltas, **kwargs):
+    stats.adjust_many(stats.ENROLLMENTS, deltas)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The admin dashboard lists the latest courses.
+    dashboard_cache.invalidate(None, instance.instructor_id)
+    old_instructor = instance.loaded_value('instructor_id')
+    if old_instructor is not None and old_instructor != instance.instructor_id:
+        dashboard_cache.invalidate(old_instructor)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instructor_id = Course.objects.filter(pk=instance.course_id).values_list('instructor_id', flat=True).first()
+    dashboard_cache.invalidate(instance.student_id, instructor_id)
+    dashboard_cache.invalidate_courses(instance.course_id)
+
+
+@receiver(enrollments_updated, sender=Enrollment)
+def invalidate_updated_enrollment_dashboards(sender, enrollments, **kwargs):
+    rows = enrollments.order_by().values_list('student_id', 'course__instructor_id', 'course_id').distinct()
+    user_ids, course_ids = set(), set()
+    for student_id, instructor_id, course_id in rows:
+        user_ids.update((student_id, instructor_id))
+        course_ids.add(course_id)
+    dashboard_cache.invalidate(*user_ids)
+    dashboard_cache.invalidate_courses(*course_ids)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_funnel(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    dashboard_cache.invalidate_courses(instance.course_id)
+    old_course_id = instance.loaded_value('course_id')
+    if old_course_id is not None and old_course_id != instance.course_id:
+        dashboard_cache.invalidate_courses(old_course_id)
+
+
+@receiver(lessons_bulk_changed, sender=Lesson)
+def invalidate_bulk_lesson_funnel(sender, course_id, **kwargs):
+    dashboard_cache.invalidate_courses(course_id)
@@ -0,0 +1,82 @@
+"""
+Incrementally maintained dashboard statistics.
+
+Each DashboardStat row is a count keyed by (metric, dimension): users by
+role, enrollments by status, and plain totals of courses and categories
+under the '' dimension. Save/delete receivers in dashboard.signals shift
+them with F() updates; ``reconcile()`` recounts everything with grouped
+queries and fixes any drift. Archived enrollments still count. Any change
+invalidates the cached admin dashboard.
+"""
+from django.db.models import Count, F
+
+from . import cache as dashboard_cache
+from .models import DashboardStat
+
+USERS = 'users'
+COURSES = 'courses'
+CATEGORIES = 'categories'
+ENROLLMENTS = 'enrollments'
+
+
+def adjust(metric, dimension='', delta=1):
+    if not delta:
+        return
+    stat = DashboardStat.objects.filter(metric=metric, dimension=dimension or '')
+    if not stat.update(value=F('value') + delta):
+        DashboardStat.objects.bulk_create(
+            [DashboardStat(metric=metric, dimension=dimension or '')], ignore_conflicts=True
+        )
+        stat.update(value=F('value') + delta)
+    dashboard_cache.invalidate(None)
+
+
+def adjust_many(metric, deltas):
+    """``deltas`` maps dimensions to shifts, e.g. ``{'active': -2, 'completed': 2}``."""
+    for dimension, delta in deltas.items():
+        adjust(metric, dimension, delta)
+
+
+def snapshot():
+    """``{metric: {dimension: value}}`` of every stat, in one query."""
+    stats = {}
+    for metric, dimension, value in DashboardStat.objects.values_list('metric', 'dimension', 'value'):
+        stats.setdefault(metric, {})[dimension] = value
+    return stats
+
+
+def total(stats, metric):
+    return sum(stats.get(metric, {}).values())
+
+
+def actual_counts():
+    """Recount every stat from the source tables."""
+    from courses.models import Category, Course
+    from enrollments.models import ArchivedEnrollment, Enrollment
+    from users.models import User
+
+    counts = {(COURSES, ''): Course.objects.count(), (CATEGORIES, ''): Category.objects.count()}
+    for role, count in User.objects.order_by().values_list('role').annotate(Count('pk')):
+        counts[USERS, role] = count
+    for model in (Enrollment, ArchivedEnrollment):
+        for status, count in model.objects.order_by().values_list('status').annotate(Count('pk')):
+            counts[ENROLLMENTS, status] = counts.get((ENROLLMENTS, status), 0) + count
+    return counts
+
+
+def reconcile():
+    """Overwrite drifted stats with recounted values. Returns ``{(metric, dimension): (old, new)}``."""
+    counts = actual_counts()
+    stored = {(s.metric, s.dimension): s.value for s in DashboardStat.objects.all()}
+    drift = {
+        key: (stored.get(key), counts.get(key, 0))
+        for key in counts.keys() | stored.keys()
+        if stored.get(key) != counts.get(key, 0)
+    }
+    if drift:
+        DashboardStat.objects.bulk_create(
+            [DashboardStat(metric=m, dimension=d, value=new) for (m, d), (_old, new) in drift.items()],
+            update_conflicts=True, unique_fields=['metric', 'dimension'], update_fields=['value', 'updated_at'],
+        )
+        dashboard_cache.invalidate(None)
+    return drift
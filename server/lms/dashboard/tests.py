@@ -1,3 +1,284 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Category, Course, Lesson
+from enrollments import archive, services
+from enrollments.models import CourseProgress, Enrollment
+from . import cache as dashboard_cache, rollups, stats
+from .models import CourseDailyStats, DashboardStat
+
+User = get_user_model()
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret-pass', role='admin'
+        )
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', username='student', password='secret-pass'
+        )
+        Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+
+    def test_hooks_match_a_full_recount(self):
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        services.complete_lesson(enrollment, self.lesson.id)
+        other = User.objects.create_user(email='other@example.com', username='other', password='secret-pass')
+        services.bulk_enroll(self.course.id, [other.id])
+        self.student.role = 'instructor'
+        self.student.save()
+        Enrollment.objects.get(student=other).delete()
+
+        counts = stats.snapshot()
+        self.assertEqual(counts[stats.ENROLLMENTS], {'active': 0, 'completed': 1})
+        self.assertEqual(counts[stats.USERS], {'admin': 1, 'instructor': 2, 'student': 1})
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_reconcile_fixes_drift(self):
+        DashboardStat.objects.filter(metric=stats.USERS, dimension='student').update(value=42)
+        self.assertEqual(stats.reconcile(), {(stats.USERS, 'student'): (42, 1)})
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_admin_dashboard_reads_stats(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.assertNumQueries(2):
+            response = client.get('/api/dashboard/admin/')
+        self.assertEqual(response.data['stats'][0]['value'], 3)
+        self.assertEqual(response.data['users_by_role'], {'admin': 1, 'instructor': 1, 'student': 1})
+
+
+class DashboardQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+
+    def enroll_students(self, count):
+        start = Enrollment.objects.count()
+        for i in range(start, start + count):
+            student = User.objects.create_user(
+                email=f'student{i}@example.com', username=f'student{i}', password='secret-pass'
+            )
+            Enrollment.objects.create(student=student, course=self.course, progress=i * 10)
+
+    def test_instructor_dashboard_query_count_is_flat(self):
+        self.client.force_authenticate(self.instructor)
+        for batch in (1, 9):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.enroll_students(batch)
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/dashboard/instructor/')
+        stats_by_label = {stat['label']: stat['value'] for stat in response.data['stats']}
+        self.assertEqual(stats_by_label['Total Students'], 10)
+        self.assertEqual(stats_by_label['Enrollments'], 10)
+        self.assertEqual(stats_by_label['Avg. Progress'], '45%')
+
+    def test_instructor_dashboard_counts_archived_students(self):
+        self.client.force_authenticate(self.instructor)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enroll_students(3)
+            archived = list(Enrollment.objects.order_by('pk')[:2])
+            Enrollment.objects.filter(pk__in=[e.pk for e in archived]).update(status='completed')
+            archive.archive_batch([e.pk for e in archived])
+            # One archived student is back in another course of the instructor.
+            other = Course.objects.create(
+                instructor=self.instructor, title='Other', slug='other',
+                description='...', price=10, is_published=True
+            )
+            Enrollment.objects.create(student=archived[0].student, course=other)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/dashboard/instructor/')
+        stats_by_label = {stat['label']: stat['value'] for stat in response.data['stats']}
+        self.assertEqual(stats_by_label['Total Students'], 3)
+        self.assertEqual(stats_by_label['Enrollments'], 4)
+
+    def test_student_dashboard_query_count(self):
+        self.enroll_students(1)
+        student = Enrollment.objects.get().student
+        self.client.force_authenticate(student)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/dashboard/student/')
+        self.assertEqual([stat['value'] for stat in response.data['stats']], [1, 1, 0, '0%'])
+
+
+class DashboardCacheTests(TestCase):
+    setUp = DashboardStatsTests.setUp
+
+    def test_payload_is_cached_until_own_enrollments_change(self):
+        cache.clear()
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        client.get('/api/dashboard/student/')
+        with self.assertNumQueries(0):
+            response = client.get('/api/dashboard/student/')
+        self.assertEqual(response.data['stats'][2]['value'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.complete_lesson(enrollment, self.lesson.id)
+        response = client.get('/api/dashboard/student/')
+        self.assertEqual(response.data['stats'][2]['value'], 1)
+        self.assertEqual(dashboard_cache.get_stats()['hit_rate'], round(1 / 3, 4))
+
+    def test_concurrent_misses_compute_once(self):
+        cache.clear()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'stats': []}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(dashboard_cache.get_or_compute('dashboard:test', compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'stats': []}] * 4)
+        self.assertEqual(dashboard_cache.get_stats()['coalesced_waits'], 3)
+
+
+class FunnelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lessons = [Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(3)]
+        self.enrollments = []
+        for i, hours in enumerate([(1, 5), (3,), ()]):
+            student = User.objects.create_user(
+                email=f'student{i}@example.com', username=f'student{i}', password='secret-pass'
+            )
+            enrollment = Enrollment.objects.create(student=student, course=self.course)
+            for lesson, elapsed in zip(self.lessons, hours):
+                services.complete_lesson(enrollment, lesson.id)
+                CourseProgress.objects.filter(enrollment=enrollment, lesson=lesson).update(
+                    completed_at=enrollment.enrolled_at + timedelta(hours=elapsed)
+                )
+            self.enrollments.append(enrollment)
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+        self.url = f'/api/dashboard/funnel/?course={self.course.id}'
+
+    def test_funnel_counts_and_medians(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['enrollments'], 3)
+        self.assertEqual(
+            [(l['completed'], l['median_seconds_to_complete']) for l in response.data['lessons']],
+            [(2, 7200), (1, 18000), (0, None)],
+        )
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.complete_lesson(self.enrollments[2], self.lessons[0].id)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['lessons'][0]['completed'], 3)
+
+    def test_only_own_courses(self):
+        other = User.objects.create_user(
+            email='other@example.com', username='other', password='secret-pass', role='instructor'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            instructor=self.instructor, category=category, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        self.today = timezone.localdate()
+        for i in range(3):
+            student = User.objects.create_user(
+                email=f'student{i}@example.com', username=f'student{i}', password='secret-pass'
+            )
+            enrollment = Enrollment.objects.create(student=student, course=self.course)
+            if i == 0:
+                services.complete_lesson(enrollment, lesson.id)
+            if i == 1:
+                enrollment.status = 'cancelled'
+                enrollment.save()
+        two_days_ago = timezone.now() - timedelta(days=2)
+        Enrollment.objects.update(enrolled_at=two_days_ago)
+        Enrollment.objects.filter(status='completed').update(completed_at=two_days_ago)
+        Enrollment.objects.filter(status='cancelled').update(cancelled_at=timezone.now() - timedelta(days=1))
+        CourseProgress.objects.update(completed_at=two_days_ago)
+
+    def test_rollup_and_range_query(self):
+        self.assertEqual(rollups.rollup_new_days(), (self.today - timedelta(days=2), self.today - timedelta(days=1)))
+        self.assertEqual(rollups.rolled_up_through(), self.today - timedelta(days=1))
+
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        with self.assertNumQueries(2):
+            response = client.get('/api/dashboard/analytics/', {'course': self.course.id})
+        self.assertEqual(len(response.data['days']), 90)
+        self.assertEqual(response.data['totals'], {'enrolled': 3, 'completed': 1, 'cancelled': 1, 'lessons_completed': 1})
+        self.assertEqual(response.data['days'][-3]['enrolled'], 3)
+
+        admin = User.objects.create_user(email='a@example.com', username='a', password='secret-pass', role='admin')
+        client.force_authenticate(admin)
+        response = client.get('/api/dashboard/analytics/', {'category': 'programming'})
+        self.assertEqual(response.data['totals']['enrolled'], 3)
+
+    def test_lessons_completed_is_left_out_without_progress_rows(self):
+        rollups.rollup_new_days()
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        with self.settings(PROGRESS_STORAGE='bitmap'):
+            response = client.get('/api/dashboard/analytics/', {'course': self.course.id})
+            self.assertEqual(response.data['totals'], {'enrolled': 3, 'completed': 1, 'cancelled': 1})
+            self.assertNotIn('lessons_completed', response.data['days'][-3])
+            with self.settings(PROGRESS_HISTORY_ROWS=True):
+                response = client.get('/api/dashboard/analytics/', {'course': self.course.id})
+        self.assertEqual(response.data['totals']['lessons_completed'], 1)
 
-# Create your tests here.
+    def test_only_new_days_are_processed(self):
+        rollups.rollup_new_days(lookback=0)
+        self.assertIsNone(rollups.rollup_new_days(lookback=0))
+        self.assertEqual(CourseDailyStats.objects.count(), 2)
@@ -1,6 +1,9 @@
 from django.urls import path
 from .views import (
     AdminDashboardSummaryView, 
+    AnalyticsView,
+    CacheStatsView,
+    FunnelView,
     InstructorDashboardSummaryView, 
     StudentDashboardSummaryView
 )
@@ -9,4 +12,7 @@ urlpatterns = [
     path('admin/', AdminDashboardSummaryView.as_view(), name='admin-dashboard'),
     path('instructor/', InstructorDashboardSummaryView.as_view(), name='instructor-dashboard'),
     path('student/', StudentDashboardSummaryView.as_view(), name='student-dashboard'),
+    path('analytics/', AnalyticsView.as_view(), name='dashboard-analytics'),
+    path('funnel/', FunnelView.as_view(), name='dashboard-funnel'),
+    path('cache-stats/', CacheStatsView.as_view(), name='dashboard-cache-stats'),
 ]
\ No newline at end of file
@@ -1,30 +1,57 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
-from django.db.models import Count, Sum
-from users.models import User
-from courses.models import Course, Category
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db.models import Avg, Count, OuterRef, Q, Subquery, Sum, Value, Window
+from courses.models import Course
 from enrollments.models import Enrollment
+from users.models import User
+from . import cache as dashboard_cache, funnel, rollups, stats
+from .models import CategoryDailyStats, CourseDailyStats
 
-class AdminDashboardSummaryView(APIView):
+
+class CachedDashboardView(APIView):
+    """
+    A dashboard summary served from ``dashboard.cache`` for a short while;
+    subclasses build the payload in ``get_payload()``.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    cache_role = None
+    allowed_roles = None
 
     def get(self, request):
-        if request.user.role != 'admin':
+        if self.allowed_roles and request.user.role not in self.allowed_roles:
             return Response({"error": "Forbidden"}, status=403)
+        return Response(
+            dashboard_cache.get_or_compute(
+                dashboard_cache.make_key(self.cache_role, request.user), lambda: self.get_payload(request)
+            )
+        )
 
-        role_wise_count = User.objects.values('role').annotate(count=Count('role'))
-        status_wise_enrollments = Enrollment.objects.values('status').annotate(count=Count('status'))
+    def get_payload(self, request):
+        raise NotImplementedError
 
+
+class AdminDashboardSummaryView(CachedDashboardView):
+    cache_role = 'admin'
+    allowed_roles = ['admin']
+
+    def get_payload(self, request):
+        # Counts come from the incrementally maintained stats table (one read).
+        counts = stats.snapshot()
         recent_courses = Course.objects.select_related('instructor', 'category').order_by('-created_at')[:3]
 
-        return Response({
+        return {
             "stats": [
-                {"label": "Total Users", "value": User.objects.count(), "type": "users"},
-                {"label": "Active Courses", "value": Course.objects.count(), "type": "courses"},
-                {"label": "Enrollments", "value": Enrollment.objects.count(), "type": "enrollments"},
-                {"label": "Categories", "value": Category.objects.count(), "type": "categories"},
+                {"label": "Total Users", "value": stats.total(counts, stats.USERS), "type": "users"},
+                {"label": "Active Courses", "value": stats.total(counts, stats.COURSES), "type": "courses"},
+                {"label": "Enrollments", "value": stats.total(counts, stats.ENROLLMENTS), "type": "enrollments"},
+                {"label": "Categories", "value": stats.total(counts, stats.CATEGORIES), "type": "categories"},
             ],
+            "users_by_role": counts.get(stats.USERS, {}),
+            "enrollments_by_status": counts.get(stats.ENROLLMENTS, {}),
             "recent_items": [{
                 "id": c.id,
                 "title": c.title,
@@ -33,25 +60,40 @@ class AdminDashboardSummaryView(APIView):
                 "category": c.category.name if c.category else "Uncategorized",
                 "color": "from-blue-500 to-indigo-600"
             } for c in recent_courses]
-        })
-
-class InstructorDashboardSummaryView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+        }
 
-    def get(self, request):
-        if request.user.role not in ['instructor', 'admin']:
-            return Response({"error": "Forbidden"}, status=403)
+class InstructorDashboardSummaryView(CachedDashboardView):
+    cache_role = 'instructor'
+    allowed_roles = ['instructor', 'admin']
 
+    def get_payload(self, request):
         instructor = request.user
-        my_courses = Course.objects.filter(instructor=instructor)
-        my_enrollments = Enrollment.objects.filter(course__instructor=instructor)
-        
-        return Response({
+        avg_progress = Enrollment.objects.filter(course__instructor=instructor).aggregate(
+            avg=Avg('progress'),
+        )['avg']
+        # Distinct students across live and archived enrollments, counted
+        # without GROUP BY so the subquery yields a single row.
+        students = User.objects.filter(
+            Q(enrollments__course__instructor=OuterRef('instructor'))
+            | Q(archived_enrollments__course__instructor=OuterRef('instructor'))
+        ).order_by().annotate(one=Value(1)).values('one').annotate(count=Count('pk', distinct=True)).values('count')
+        # The latest courses carry the instructor's totals along; the stored
+        # enrollment counters include archived enrollments.
+        recent_courses = list(
+            Course.objects.filter(instructor=instructor).select_related('category').annotate(
+                total_courses=Window(Count('id')),
+                total_enrollments=Window(Sum('enrollment_count')),
+                total_students=Subquery(students),
+            ).order_by('-created_at')[:3]
+        )
+        first = recent_courses[0] if recent_courses else None
+
+        return {
             "stats": [
-                {"label": "My Courses", "value": my_courses.count(), "type": "courses"},
-                {"label": "Total Students", "value": my_enrollments.values('student').distinct().count(), "type": "users"},
-                {"label": "Enrollments", "value": my_enrollments.count(), "type": "enrollments"},
-                {"label": "Avg. Progress", "value": f"{round(my_enrollments.aggregate(Sum('progress'))['progress__sum'] or 0 / (my_enrollments.count() or 1))}%", "type": "trend"},
+                {"label": "My Courses", "value": first.total_courses if first else 0, "type": "courses"},
+                {"label": "Total Students", "value": first.total_students if first else 0, "type": "users"},
+                {"label": "Enrollments", "value": first.total_enrollments if first else 0, "type": "enrollments"},
+                {"label": "Avg. Progress", "value": f"{round(avg_progress or 0)}%", "type": "trend"},
             ],
             "recent_items": [{
                 "id": c.id,
@@ -60,21 +102,33 @@ class InstructorDashboardSummaryView(APIView):
                 "progress": 0,
                 "category": c.category.name if c.category else "Uncategorized",
                 "color": "from-purple-500 to-pink-600"
-            } for c in my_courses[:3]]
-        })
+            } for c in recent_courses]
+        }
 
-class StudentDashboardSummaryView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+class StudentDashboardSummaryView(CachedDashboardView):
+    cache_role = 'student'
 
-    def get(self, request):
+    def get_payload(self, request):
+        # One row per (live, archived) enrollment pair of this single user:
+        # distinct counts are exact, and the average is unaffected because
+        # every live enrollment is repeated equally often.
+        totals = User.objects.filter(pk=request.user.pk).aggregate(
+            enrolled=Count('enrollments', distinct=True) + Count('archived_enrollments', distinct=True),
+            active=Count('enrollments', filter=Q(enrollments__status='active'), distinct=True),
+            completed=(
+                Count('enrollments', filter=Q(enrollments__status='completed'), distinct=True)
+                + Count('archived_enrollments', filter=Q(archived_enrollments__status='completed'), distinct=True)
+            ),
+            avg_progress=Avg('enrollments__progress'),
+        )
         my_enrollments = Enrollment.objects.filter(student=request.user).select_related('course', 'course__instructor', 'course__category')
-        
-        return Response({
+
+        return {
             "stats": [
-                {"label": "Enrolled", "value": my_enrollments.count(), "type": "courses"},
-                {"label": "Active", "value": my_enrollments.filter(status='active').count(), "type": "enrollments"},
-                {"label": "Completed", "value": my_enrollments.filter(status='completed').count(), "type": "completed"},
-                {"label": "Avg. Progress", "value": f"{round(my_enrollments.aggregate(avg=Sum('progress'))['avg'] or 0)}%", "type": "trend"},
+                {"label": "Enrolled", "value": totals['enrolled'], "type": "courses"},
+                {"label": "Active", "value": totals['active'], "type": "enrollments"},
+                {"label": "Completed", "value": totals['completed'], "type": "completed"},
+                {"label": "Avg. Progress", "value": f"{round(totals['avg_progress'] or 0)}%", "type": "trend"},
             ],
             "recent_items": [{
                 "id": en.id,
@@ -84,4 +138,109 @@ class StudentDashboardSummaryView(APIView):
                 "category": en.course.category.name if en.course.category else "General",
                 "color": "from-orange-500 to-rose-600"
             } for en in my_enrollments[:3]]
-        })
\ No newline at end of file
+        }
+
+
+class FunnelView(APIView):
+    """
+    Per-lesson completion funnel of ``?course=<id>``: completions and the
+    median time to complete each lesson. Instructors see their own courses.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.role not in ['instructor', 'admin']:
+            return Response({"error": "Forbidden"}, status=403)
+
+        course_id = request.query_params.get('course', '')
+        if not course_id.isdigit():
+            return Response({"error": "course must be an id"}, status=400)
+        courses = Course.objects.filter(pk=course_id)
+        if user.role != 'admin':
+            courses = courses.filter(instructor=user)
+        if not courses.exists():
+            return Response({"error": "Course not found"}, status=404)
+
+        return Response(dashboard_cache.get_or_compute(
+            dashboard_cache.funnel_key(course_id), lambda: funnel.course_funnel(int(course_id))
+        ))
+
+
+class CacheStatsView(APIView):
+    """Hit rate and recompute time of the dashboard cache (admins only)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Forbidden"}, status=403)
+        return Response(dashboard_cache.get_stats())
+
+
+class AnalyticsView(APIView):
+    """
+    Daily counts over a date range from the rollup tables:
+    ``?start=&end=`` (default: the last 90 days), optionally narrowed with
+    ``course=<id>`` or ``category=<slug>``. Instructors see their own courses.
+    Counters the progress storage has no data for are left out (see ``rollups``).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_days = 90
+    max_days = 366
+
+    def parse_day(self, request, name, default):
+        value = request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            return parse_date(value)
+        except ValueError:
+            return None
+
+    def get(self, request):
+        user = request.user
+        if user.role not in ['instructor', 'admin']:
+            return Response({"error": "Forbidden"}, status=403)
+
+        end = self.parse_day(request, 'end', timezone.localdate())
+        start = self.parse_day(request, 'start', end and end - timedelta(days=self.default_days - 1))
+        if start is None or end is None:
+            return Response({"error": "start and end must be dates (YYYY-MM-DD)"}, status=400)
+        if start > end or (end - start).days >= self.max_days:
+            return Response({"error": f"The range must be 1 to {self.max_days} days"}, status=400)
+
+        course_id = request.query_params.get('course')
+        category = request.query_params.get('category')
+        if course_id is not None and not course_id.isdigit():
+            return Response({"error": "course must be an id"}, status=400)
+
+        if user.role == 'admin' and category and not course_id:
+            rows = CategoryDailyStats.objects.filter(category__slug=category)
+        else:
+            rows = CourseDailyStats.objects.all()
+            if user.role != 'admin':
+                rows = rows.filter(course__instructor=user)
+            if course_id:
+                rows = rows.filter(course_id=course_id)
+            if category:
+                rows = rows.filter(course__category__slug=category)
+
+        fields = rollups.reported_fields()
+        daily = {
+            row.pop('day'): row for row in rows.filter(day__range=(start, end)).order_by('day').values('day').annotate(
+                **{name: Sum(name) for name in fields}
+            )
+        }
+        empty = dict.fromkeys(fields, 0)
+        days = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            days.append({"day": day, **daily.get(day, empty)})
+
+        return Response({
+            "start": start,
+            "end": end,
+            "rolled_up_through": rollups.rolled_up_through(),
+            "totals": {name: sum(day[name] for day in days) for name in fields},
+            "days": days,
+        })
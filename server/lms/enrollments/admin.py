@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Enrollment, CourseProgress
+from .models import ArchivedEnrollment, Enrollment, CourseProgress
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -13,3 +13,11 @@ class CourseProgressAdmin(admin.ModelAdmin):
     list_display = ['enrollment', 'lesson', 'is_completed', 'completed_at']
     list_filter = ['is_completed', 'completed_at']
     raw_id_fields = ['enrollment', 'lesson']
+
+
+@admin.register(ArchivedEnrollment)
+class ArchivedEnrollmentAdmin(admin.ModelAdmin):
+    list_display = ['student', 'course', 'status', 'progress', 'enrolled_at', 'archived_at']
+    list_filter = ['status', 'archived_at']
+    search_fields = ['student__email', 'course__title']
+    raw_id_fields = ['student', 'course']
@@ -0,0 +1,119 @@
+"""
+Archive tier for finished enrollments.
+
+Completed and cancelled enrollments that finished before a cutoff are moved,
+with their CourseProgress rows, into ArchivedEnrollment and
+ArchivedCourseProgress in batches, keeping their ids. Live tables and their
+indexes then only hold what current students touch. Archiving doesn't count
+as unenrolling: the stored course enrollment counters are left alone.
+``restore_enrollments()`` moves rows back.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedCourseProgress, ArchivedEnrollment, CourseProgress, Enrollment
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+ENROLLMENT_FIELDS = [
+    'id', 'student_id', 'course_id', 'status', 'enrolled_at', 'completed_at', 'cancelled_at',
+    'progress', 'completed_lessons', 'completed_bitmap',
+]
+PROGRESS_FIELDS = ['id', 'enrollment_id', 'lesson_id', 'is_completed', 'completed_at']
+
+_state = threading.local()
+
+
+def is_archiving():
+    """True while enrollments are being moved; delete signal receivers should stand down."""
+    return getattr(_state, 'active', False)
+
+
+@contextmanager
+def archiving():
+    _state.active = True
+    try:
+        yield
+    finally:
+        _state.active = False
+
+
+def archivable(older_than):
+    """Live enrollments completed or cancelled before ``older_than``."""
+    return Enrollment.objects.filter(status__in=ARCHIVABLE_STATUSES).alias(
+        finished_at=Coalesce('completed_at', 'cancelled_at', 'enrolled_at'),
+    ).filter(finished_at__lt=older_than)
+
+
+def archive_batch(enrollment_ids):
+    """Move these enrollments, if still finished, and their progress rows. Returns the number moved."""
+    with transaction.atomic():
+        rows = list(
+            Enrollment.objects.filter(pk__in=enrollment_ids, status__in=ARCHIVABLE_STATUSES)
+            .select_for_update().values(*ENROLLMENT_FIELDS)
+        )
+        if not rows:
+            return 0
+        moved = [row['id'] for row in rows]
+        ArchivedEnrollment.objects.bulk_create([ArchivedEnrollment(**row) for row in rows])
+        ArchivedCourseProgress.objects.bulk_create([
+            ArchivedCourseProgress(**row)
+            for row in CourseProgress.objects.filter(enrollment_id__in=moved).values(*PROGRESS_FIELDS)
+        ], batch_size=1000)
+        with archiving():
+            Enrollment.objects.filter(pk__in=moved).delete()
+    return len(moved)
+
+
+def archive_enrollments(older_than_days, batch_size=500):
+    """Archive every finished enrollment older than the cutoff, one batch per transaction."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        batch = list(archivable(cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return total
+        total += archive_batch(batch)
+
+
+def restore_enrollments(enrollment_ids=None, student_id=None):
+    """
+    Move archived enrollments back to the live tables. Those whose student
+    has since enrolled in the course again stay archived. Returns
+    ``(restored, skipped)``.
+    """
+    archived = ArchivedEnrollment.objects.all()
+    if enrollment_ids is not None:
+        archived = archived.filter(pk__in=enrollment_ids)
+    if student_id is not None:
+        archived = archived.filter(student_id=student_id)
+
+    with transaction.atomic():
+        rows = list(archived.select_for_update().values(*ENROLLMENT_FIELDS))
+        if not rows:
+            return 0, 0
+        taken = set(Enrollment.objects.filter(
+            student_id__in={row['student_id'] for row in rows},
+            course_id__in={row['course_id'] for row in rows},
+        ).values_list('student_id', 'course_id'))
+        skipped = len(rows)
+        rows = [row for row in rows if (row['student_id'], row['course_id']) not in taken]
+        skipped -= len(rows)
+        restored = [row['id'] for row in rows]
+
+        # bulk_create skips post_save, so counters stay as they were when
+        # archived, but stamps enrolled_at (auto_now_add): put it back.
+        enrollments = Enrollment.objects.bulk_create([Enrollment(**row) for row in rows])
+        for enrollment, row in zip(enrollments, rows):
+            enrollment.enrolled_at = row['enrolled_at']
+        Enrollment.objects.bulk_update(enrollments, ['enrolled_at'], batch_size=1000)
+        CourseProgress.objects.bulk_create([
+            CourseProgress(**row)
+            for row in ArchivedCourseProgress.objects.filter(enrollment_id__in=restored).values(*PROGRESS_FIELDS)
+        ], batch_size=1000)
+        ArchivedEnrollment.objects.filter(pk__in=restored).delete()
+    return len(restored), skipped
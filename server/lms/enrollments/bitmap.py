@@ -0,0 +1,57 @@
+"""
+Per-enrollment lesson completion stored as a bitset.
+
+Bit ``n`` of ``Enrollment.completed_bitmap`` is set once the lesson with
+``Lesson.slot == n`` of that course is completed. Slots are handed out per
+course and never reused, so a bitmap stays valid when lessons are reordered
+or deleted; bits of deleted lessons are masked out when counting.
+"""
+
+
+class LessonBitmap:
+    """A growable little-endian bitset: bit ``n`` is bit ``n % 8`` of byte ``n // 8``."""
+
+    __slots__ = ('_bits',)
+
+    def __init__(self, data=b''):
+        self._bits = int.from_bytes(bytes(data or b''), 'little')
+
+    @classmethod
+    def from_slots(cls, slots):
+        bitmap = cls()
+        for slot in slots:
+            bitmap.set(slot)
+        return bitmap
+
+    def set(self, slot):
+        """Set bit ``slot``. Returns False if it was already set."""
+        bit = 1 << slot
+        if self._bits & bit:
+            return False
+        self._bits |= bit
+        return True
+
+    def test(self, slot):
+        return slot is not None and bool(self._bits >> slot & 1)
+
+    def popcount(self, mask=None):
+        """Number of set bits, only counting those also set in ``mask`` if given."""
+        bits = self._bits if mask is None else self._bits & mask._bits
+        return bits.bit_count()
+
+    def slots(self):
+        bits, slot = self._bits, 0
+        while bits:
+            if bits & 1:
+                yield slot
+            bits >>= 1
+            slot += 1
+
+    def to_bytes(self):
+        return self._bits.to_bytes((self._bits.bit_length() + 7) // 8, 'little')
+
+    def __eq__(self, other):
+        return isinstance(other, LessonBitmap) and self._bits == other._bits
+
+    def __repr__(self):
+        return f'LessonBitmap({sorted(self.slots())})'
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from enrollments import archive
+
+
+class Command(BaseCommand):
+    help = ('Move completed and cancelled enrollments finished long ago, with their progress, '
+            'to the archive tables; or restore archived ones. Meant to run from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='Defaults to ENROLLMENT_ARCHIVE_AFTER_DAYS.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--restore', type=int, action='append', dest='restore_ids',
+                            help='Restore this archived enrollment id (repeatable).')
+        parser.add_argument('--restore-student', type=int, default=None,
+                            help='Restore every archived enrollment of this student id.')
+
+    def handle(self, *args, **options):
+        if options['restore_ids'] or options['restore_student']:
+            restored, skipped = archive.restore_enrollments(
+                options['restore_ids'], student_id=options['restore_student']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Restored {restored} enrollments; {skipped} skipped (enrolled again since).'
+            ))
+            return
+
+        days = options['older_than_days']
+        if days is None:
+            days = getattr(settings, 'ENROLLMENT_ARCHIVE_AFTER_DAYS', 365)
+        started = time.monotonic()
+        archived = archive.archive_enrollments(days, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} enrollments finished over {days} days ago '
+            f'in {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from enrollments import services
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Enrollment.completed_bitmap from CourseProgress rows (run before PROGRESS_STORAGE = "bitmap").'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollment', type=int, action='append', dest='enrollment_ids',
+                            help='Only rebuild this enrollment id (repeatable).')
+
+    def handle(self, *args, **options):
+        built = services.build_completion_bitmaps(options['enrollment_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Built completion bitmaps for {built} enrollments.'))
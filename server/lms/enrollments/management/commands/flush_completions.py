@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from enrollments import write_behind
+
+
+class Command(BaseCommand):
+    help = 'Apply lesson completions queued by the write-behind buffer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and flush every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        while True:
+            applied = write_behind.flush_all(options['batch_size'])
+            if applied or not options['loop']:
+                self.stdout.write(f'Applied {applied} queued completions.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
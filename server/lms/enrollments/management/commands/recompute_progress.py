@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from enrollments import services
+from enrollments.models import Enrollment
+
+
+def _setup_worker():
+    # Forked workers must not share the parent's database connections;
+    # spawned ones need Django set up from scratch.
+    django.setup()
+    connections.close_all()
+
+
+def _recompute_chunk(enrollment_ids, dry_run):
+    return len(enrollment_ids), services.recompute_progress(enrollment_ids, dry_run)
+
+
+class Command(BaseCommand):
+    help = ('Recompute completed lesson counts, progress and completed status of enrollments, '
+            'e.g. after lessons were added or removed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only recompute enrollments of this course id (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes to fan chunks out to (1 runs in this process).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing.')
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.order_by('pk')
+        if options['course_ids']:
+            enrollments = enrollments.filter(course_id__in=options['course_ids'])
+        ids = list(enrollments.values_list('pk', flat=True))
+        size = options['chunk_size']
+        chunks = [ids[start:start + size] for start in range(0, len(ids), size)]
+
+        started = time.monotonic()
+        processed = changed = 0
+        for count, changes in self.run_chunks(chunks, options['workers'], options['dry_run']):
+            processed += count
+            changed += len(changes)
+            if options['dry_run'] or options['verbosity'] > 1:
+                for pk, old, new in changes:
+                    self.stdout.write(f'enrollment {pk}: {self.describe(old)} -> {self.describe(new)}')
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {processed} enrollments in {elapsed:.1f}s ({rate:.0f}/s); {changed} {verb}.'
+        ))
+
+    def run_chunks(self, chunks, workers, dry_run):
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield _recompute_chunk(chunk, dry_run)
+            return
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+            yield from pool.map(_recompute_chunk, chunks, [dry_run] * len(chunks))
+
+    @staticmethod
+    def describe(state):
+        completed, progress, status = state
+        return f'{completed} lessons, {progress}%, {status}'
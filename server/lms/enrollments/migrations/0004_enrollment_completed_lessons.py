@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 17:11
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_completed_lessons(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    CourseProgress = apps.get_model('enrollments', 'CourseProgress')
+
+    completed = CourseProgress.objects.filter(
+        enrollment=OuterRef('pk'), is_completed=True
+    ).order_by().values('enrollment').annotate(total=Count('pk')).values('total')
+    Enrollment.objects.update(
+        completed_lessons=Coalesce(Subquery(completed, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0003_indexes_for_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_completed_lessons, migrations.RunPython.noop),
+    ]
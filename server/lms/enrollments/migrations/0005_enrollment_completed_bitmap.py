@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+def build_bitmaps(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    CourseProgress = apps.get_model('enrollments', 'CourseProgress')
+
+    bits = {}
+    completed = CourseProgress.objects.filter(is_completed=True).order_by()
+    for enrollment_id, slot in completed.values_list('enrollment_id', 'lesson__slot').iterator():
+        bits[enrollment_id] = bits.get(enrollment_id, 0) | 1 << slot
+    Enrollment.objects.bulk_update(
+        [
+            Enrollment(pk=pk, completed_bitmap=value.to_bytes((value.bit_length() + 7) // 8, 'little'))
+            for pk, value in bits.items()
+        ],
+        ['completed_bitmap'], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0004_enrollment_completed_lessons'),
+        ('courses', '0007_lesson_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_bitmap',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_lesson_slots'),
+        ('enrollments', '0005_enrollment_completed_bitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEnrollment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('enrolled_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('progress', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('completed_lessons', models.PositiveIntegerField(default=0)),
+                ('completed_bitmap', models.BinaryField(default=b'')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_enrollments', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_enrollments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-enrolled_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCourseProgress',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.lesson')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress', to='enrollments.archivedenrollment')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedenrollment',
+            index=models.Index(fields=['student', '-enrolled_at', '-id'], name='enrollments_student_267400_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedenrollment',
+            index=models.Index(fields=['course', '-enrolled_at', '-id'], name='enrollments_course__ec22b2_idx'),
+        ),
+    ]
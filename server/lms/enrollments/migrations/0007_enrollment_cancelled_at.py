@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0006_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedenrollment',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from courses.models import Course
+from lms.mixins import TrackedModelMixin
 
-class Enrollment(models.Model):
+class Enrollment(TrackedModelMixin, models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('completed', 'Completed'),
@@ -22,11 +24,28 @@ class Enrollment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     enrolled_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
+    cancelled_at = models.DateTimeField(blank=True, null=True, editable=False)
     progress = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    completed_lessons = models.PositiveIntegerField(default=0, editable=False)
+    # One bit per Lesson.slot, used when PROGRESS_STORAGE = 'bitmap'.
+    completed_bitmap = models.BinaryField(default=b'', editable=False)
+
+    def save(self, *args, **kwargs):
+        was_cancelled = self.loaded_value('status') == 'cancelled'
+        if (self.status == 'cancelled') != was_cancelled:
+            self.cancelled_at = timezone.now() if self.status == 'cancelled' else None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'cancelled_at'}
+        super().save(*args, **kwargs)
 
     class Meta:
         unique_together = ('student', 'course')
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['-enrolled_at', '-id']),
+            models.Index(fields=['student', '-enrolled_at', '-id']),
+            models.Index(fields=['course', '-enrolled_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.student.email} enrolled in {self.course.title}"
@@ -42,3 +61,50 @@ class CourseProgress(models.Model):
 
     def __str__(self):
         return f"{self.enrollment.student.email} - {self.lesson.title} - {self.is_completed}"
+
+
+class ArchivedEnrollment(models.Model):
+    """
+    A finished enrollment moved out of the live table by
+    ``enrollments.archive``. Ids are kept, so restoring is a plain copy back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_enrollments'
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='archived_enrollments'
+    )
+    status = models.CharField(max_length=20, choices=Enrollment.STATUS_CHOICES)
+    enrolled_at = models.DateTimeField()
+    completed_at = models.DateTimeField(blank=True, null=True)
+    cancelled_at = models.DateTimeField(blank=True, null=True)
+    progress = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    completed_lessons = models.PositiveIntegerField(default=0)
+    completed_bitmap = models.BinaryField(default=b'')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at', '-id']),
+            models.Index(fields=['course', '-enrolled_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.email} enrolled in {self.course.title} (archived)"
+
+
+class ArchivedCourseProgress(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    enrollment = models.ForeignKey(ArchivedEnrollment, on_delete=models.CASCADE, related_name='lesson_progress')
+    lesson = models.ForeignKey('courses.Lesson', on_delete=models.CASCADE, related_name='+')
+    is_completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.enrollment.student.email} - {self.lesson.title} - {self.is_completed} (archived)"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from .models import Enrollment, CourseProgress
-from courses.serializers import CourseSerializer
+from .models import ArchivedEnrollment, Enrollment, CourseProgress
+from courses.serializers import CourseSerializer, CourseSummarySerializer
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     course_details = CourseSerializer(source='course', read_only=True)
@@ -15,15 +15,44 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['student', 'enrolled_at', 'completed_at', 'progress']
 
-    def validate(self, data):
-        student = self.context['request'].user
-        course = data['course']
-        if Enrollment.objects.filter(student=student, course=course).exists():
-            raise serializers.ValidationError("You are already enrolled in this course.")
-        return data
+
+class CompactEnrollmentSerializer(EnrollmentSerializer):
+    """Enrollment with only the course's id, title, slug and thumbnail (``?compact=1``)."""
+    course_details = CourseSummarySerializer(source='course', read_only=True)
+
+
+class EnrollmentHistorySerializer(serializers.ModelSerializer):
+    course_details = CourseSummarySerializer(source='course', read_only=True)
+    archived = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'course', 'course_details', 'status', 'enrolled_at', 'completed_at', 'progress', 'archived']
+
+    def get_archived(self, obj):
+        return isinstance(obj, ArchivedEnrollment)
+
+
+class ArchivedEnrollmentHistorySerializer(EnrollmentHistorySerializer):
+    class Meta(EnrollmentHistorySerializer.Meta):
+        model = ArchivedEnrollment
+
 
 class CourseProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseProgress
         fields = ['id', 'enrollment', 'lesson', 'is_completed', 'completed_at']
         read_only_fields = ['completed_at']
+
+
+class CompletionSyncSerializer(serializers.Serializer):
+    lesson_id = serializers.IntegerField(min_value=1)
+    completed_at = serializers.DateTimeField(required=False)
+
+
+class BulkEnrollSerializer(serializers.Serializer):
+    course = serializers.IntegerField(min_value=1)
+    students = serializers.ListField(
+        child=serializers.CharField(max_length=254), allow_empty=False, max_length=10000,
+        help_text="Student ids or email addresses.",
+    )
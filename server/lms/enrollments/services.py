@@ -0,0 +1,492 @@
+"""
+Enrollment, lesson completion and enrollment progress.
+
+``Enrollment.completed_lessons`` is a stored counter that only moves by
+atomic F() increments, and ``Enrollment.progress`` is derived from it and
+the course's stored ``lesson_count`` in the same UPDATE. Two requests
+completing lessons at the same time therefore can't lose each other's work.
+
+Which lessons are done is kept either as CourseProgress rows or, with
+``PROGRESS_STORAGE = 'bitmap'``, as ``Enrollment.completed_bitmap``. Bitmap
+writes are compare-and-swap UPDATEs on the value last read, retried when
+another request got there first.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count, DecimalField, F, FilteredRelation, FloatField, IntegerField, OuterRef, Q, Subquery, Value,
+)
+from django.db.models.functions import Cast, Coalesce, Least, NullIf, Round
+from django.utils import timezone
+
+from courses import counters
+from courses.models import Course, Lesson
+from . import signals, write_behind
+from .bitmap import LessonBitmap
+from .models import CourseProgress, Enrollment
+
+
+ENROLL_CHUNK_SIZE = 1000
+
+
+class AlreadyEnrolled(Exception):
+    pass
+
+
+def enroll(serializer, student):
+    """
+    Save a new enrollment with one INSERT, relying on the unique constraint
+    instead of a prior lookup. Raises AlreadyEnrolled on a duplicate.
+    """
+    try:
+        with transaction.atomic():
+            return serializer.save(student=student)
+    except IntegrityError:
+        raise AlreadyEnrolled
+
+
+def resolve_students(identifiers):
+    """
+    Map student ids and emails to user ids. Returns ``(ids, unknown
+    identifiers)``; identifiers of instructors and admins count as unknown.
+    """
+    students = get_user_model().objects.filter(role='student')
+    ids = {int(value) for value in identifiers if value.isdigit()}
+    emails = {value for value in identifiers if not value.isdigit()}
+    found_ids = set(students.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+    by_email = dict(students.filter(email__in=emails).values_list('email', 'pk')) if emails else {}
+
+    unknown = [
+        value for value in identifiers
+        if (int(value) not in found_ids if value.isdigit() else value not in by_email)
+    ]
+    return sorted(found_ids | set(by_email.values())), unknown
+
+
+def bulk_enroll(course_id, student_ids, chunk_size=ENROLL_CHUNK_SIZE):
+    """
+    Enroll many students with ``ignore_conflicts`` inserts in chunks.
+    Returns ``(created, already_enrolled)``.
+    """
+    created = 0
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        with transaction.atomic():
+            # Every enrollment insert also updates its course's counter row,
+            # so while this chunk holds that row's lock no other enrollment
+            # can commit between the two counts below.
+            list(Course.objects.select_for_update().filter(pk=course_id).values_list('pk', flat=True))
+            enrolled = Enrollment.objects.filter(course_id=course_id, student_id__in=chunk)
+            before = enrolled.count()
+            Enrollment.objects.bulk_create(
+                [Enrollment(course_id=course_id, student_id=pk) for pk in chunk],
+                ignore_conflicts=True,
+            )
+            inserted = enrolled.count() - before
+            # bulk_create skips post_save, which keeps this counter otherwise.
+            counters.adjust_enrollment_count(course_id, inserted)
+            statuses_changed({'active': inserted})
+            enrollments_updated(enrolled)
+        created += inserted
+    return created, len(student_ids) - created
+
+
+def uses_bitmap():
+    return getattr(settings, 'PROGRESS_STORAGE', 'rows') == 'bitmap'
+
+
+def keeps_progress_rows():
+    """Whether CourseProgress rows are written: always in row mode, optionally as history."""
+    return not uses_bitmap() or getattr(settings, 'PROGRESS_HISTORY_ROWS', False)
+
+
+def course_lesson_count():
+    """The stored lesson count of the enrollment's course, as a subquery."""
+    return Subquery(
+        Course.objects.filter(pk=OuterRef('course_id')).order_by().values('lesson_count'),
+        output_field=IntegerField(),
+    )
+
+
+def progress_percentage(completed, total):
+    """SQL expression for ``completed / total`` as a 0-100 percentage."""
+    ratio = Cast(completed, FloatField()) * Value(100.0) / NullIf(total, Value(0))
+    return Cast(
+        Least(Coalesce(Round(ratio, 2), Value(0.0)), Value(100.0)),
+        DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+def statuses_changed(deltas):
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if deltas:
+        signals.enrollment_statuses_changed.send(sender=Enrollment, deltas=deltas)
+
+
+def enrollments_updated(enrollments):
+    signals.enrollments_updated.send(sender=Enrollment, enrollments=enrollments)
+
+
+def mark_completed_if_finished(enrollment_ids, now=None):
+    """Flag active enrollments whose every lesson is done. Returns the number flagged."""
+    flagged = Enrollment.objects.filter(
+        pk__in=enrollment_ids,
+        status='active',
+        completed_lessons__gte=course_lesson_count(),
+        completed_lessons__gt=0,
+    ).update(status='completed', completed_at=now or timezone.now())
+    statuses_changed({'active': -flagged, 'completed': flagged})
+    return flagged
+
+
+def complete_lesson(enrollment, lesson_id):
+    """
+    Mark ``lesson_id`` completed for ``enrollment`` and return the refreshed
+    enrollment. Completing an already completed lesson changes nothing.
+    In write-behind mode the completion is queued instead.
+    """
+    if write_behind.is_enabled():
+        return queue_completion(enrollment, lesson_id)
+
+    now = timezone.now()
+    with transaction.atomic():
+        if uses_bitmap():
+            slot = Lesson.objects.filter(pk=lesson_id).values_list('slot', flat=True).get()
+            newly_completed = bool(set_completed_slots(enrollment.pk, [slot]))
+            if newly_completed and keeps_progress_rows():
+                CourseProgress.objects.update_or_create(
+                    enrollment=enrollment, lesson_id=lesson_id,
+                    defaults={'is_completed': True, 'completed_at': now},
+                )
+        else:
+            progress, _created = CourseProgress.objects.get_or_create(
+                enrollment=enrollment, lesson_id=lesson_id
+            )
+            # Only the request that flips the row counts it, however many race.
+            newly_completed = CourseProgress.objects.filter(
+                pk=progress.pk, is_completed=False
+            ).update(is_completed=True, completed_at=now)
+
+            if newly_completed:
+                Enrollment.objects.filter(pk=enrollment.pk).update(
+                    completed_lessons=F('completed_lessons') + 1,
+                    progress=progress_percentage(F('completed_lessons') + 1, course_lesson_count()),
+                )
+
+        if newly_completed:
+            mark_completed_if_finished([enrollment.pk], now)
+            enrollments_updated(Enrollment.objects.filter(pk=enrollment.pk))
+
+    enrollment.refresh_from_db(
+        fields=['completed_lessons', 'completed_bitmap', 'progress', 'status', 'completed_at']
+    )
+    return enrollment
+
+
+def set_completed_slots(enrollment_id, slots):
+    """
+    Set the bits of ``slots`` in an enrollment's completion bitmap, moving
+    its counter and progress by the number newly set. Returns those slots.
+    """
+    while True:
+        current = bytes(
+            Enrollment.objects.filter(pk=enrollment_id).values_list('completed_bitmap', flat=True).get()
+        )
+        bitmap = LessonBitmap(current)
+        new_slots = [slot for slot in slots if bitmap.set(slot)]
+        if not new_slots:
+            return []
+        completed = F('completed_lessons') + len(new_slots)
+        swapped = Enrollment.objects.filter(pk=enrollment_id, completed_bitmap=current).update(
+            completed_bitmap=bitmap.to_bytes(),
+            completed_lessons=completed,
+            progress=progress_percentage(completed, course_lesson_count()),
+        )
+        if swapped:
+            return new_slots
+
+
+def course_slot_masks(course_ids):
+    """``{course_id: LessonBitmap}`` of the slots of each course's current lessons."""
+    masks = {course_id: LessonBitmap() for course_id in course_ids}
+    for course_id, slot in Lesson.objects.filter(course_id__in=course_ids).values_list('course_id', 'slot'):
+        masks[course_id].set(slot)
+    return masks
+
+
+def recalculate_course_progress(course_id, batch_size=1000):
+    """
+    Recompute every enrollment of a course after its lessons changed,
+    ``batch_size`` enrollments per ``recompute_progress()`` call and transaction.
+    """
+    last_pk = 0
+    while True:
+        batch = list(
+            Enrollment.objects.filter(course_id=course_id, pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        recompute_progress(batch)
+        last_pk = batch[-1]
+
+
+def build_completion_bitmaps(enrollment_ids=None):
+    """
+    (Re)build completion bitmaps from CourseProgress rows, e.g. before
+    switching to bitmap storage. Returns the number of enrollments touched.
+    """
+    enrollments = Enrollment.objects.all()
+    if enrollment_ids is not None:
+        enrollments = enrollments.filter(pk__in=enrollment_ids)
+    slots = CourseProgress.objects.filter(
+        enrollment__in=enrollments, is_completed=True
+    ).order_by().values_list('enrollment_id', 'lesson__slot')
+
+    bitmaps = {}
+    for enrollment_id, slot in slots.iterator():
+        bitmaps.setdefault(enrollment_id, LessonBitmap()).set(slot)
+
+    with transaction.atomic():
+        enrollments.exclude(pk__in=bitmaps).update(completed_bitmap=b'')
+        Enrollment.objects.bulk_update(
+            [Enrollment(pk=pk, completed_bitmap=bitmap.to_bytes()) for pk, bitmap in bitmaps.items()],
+            ['completed_bitmap'], batch_size=1000,
+        )
+    return len(bitmaps)
+
+
+def expected_progress(completed, total):
+    """Python twin of ``progress_percentage()``."""
+    if not total:
+        return Decimal('0.00')
+    percentage = Decimal(completed * 100) / total
+    return min(percentage, Decimal(100)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def recompute_progress(enrollment_ids, dry_run=False):
+    """
+    Recompute the counter, percentage and completed status of a chunk of
+    enrollments with grouped queries and write the ones that changed back
+    with one ``bulk_update``. Returns ``(enrollment id, old, new)`` for
+    each change, where old and new are ``(completed, progress, status)``.
+
+    This is the one place progress is recounted: an enrollment is completed
+    once it has done every lesson of a course that has any, and is active
+    otherwise (cancelled ones stay cancelled).
+    """
+    with transaction.atomic():
+        return _recompute_progress(enrollment_ids, dry_run)
+
+
+def _recompute_progress(enrollment_ids, dry_run):
+    enrollments = Enrollment.objects.filter(pk__in=enrollment_ids).order_by('pk')
+    if not dry_run:
+        # A completion landing meanwhile waits, then counts on top of this recount.
+        enrollments = enrollments.select_for_update()
+    enrollments = list(enrollments.only(
+        'id', 'course_id', 'status', 'completed_at', 'progress', 'completed_lessons', 'completed_bitmap',
+    ))
+    course_ids = {e.course_id for e in enrollments}
+    totals = dict(Course.objects.filter(pk__in=course_ids).values_list('id', 'lesson_count'))
+    if uses_bitmap():
+        masks = course_slot_masks(course_ids)
+        counts = {e.pk: LessonBitmap(e.completed_bitmap).popcount(masks[e.course_id]) for e in enrollments}
+    else:
+        counts = dict(
+            CourseProgress.objects.filter(enrollment_id__in=enrollment_ids, is_completed=True)
+            .order_by().values('enrollment_id').annotate(total=Count('pk'))
+            .values_list('enrollment_id', 'total')
+        )
+
+    now = timezone.now()
+    changes, changed = [], []
+    for enrollment in enrollments:
+        completed = counts.get(enrollment.pk, 0)
+        total = totals.get(enrollment.course_id, 0)
+        status = enrollment.status
+        if status != 'cancelled':
+            status = 'completed' if total and completed >= total else 'active'
+        old = (enrollment.completed_lessons, Decimal(enrollment.progress), enrollment.status)
+        new = (completed, expected_progress(completed, total), status)
+        if old == new:
+            continue
+        changes.append((enrollment.pk, old, new))
+        if status != enrollment.status:
+            enrollment.completed_at = now if status == 'completed' else None
+        enrollment.completed_lessons, enrollment.progress, enrollment.status = new
+        changed.append(enrollment)
+
+    if changed and not dry_run:
+        Enrollment.objects.bulk_update(
+            changed, ['completed_lessons', 'progress', 'status', 'completed_at'], batch_size=500
+        )
+        deltas = {}
+        for _pk, old, new in changes:
+            deltas[old[2]] = deltas.get(old[2], 0) - 1
+            deltas[new[2]] = deltas.get(new[2], 0) + 1
+        statuses_changed(deltas)
+        enrollments_updated(Enrollment.objects.filter(pk__in=[pk for pk, _old, _new in changes]))
+    return changes
+
+
+def completed_lesson_ids(enrollment, lesson_ids):
+    """Those of ``lesson_ids`` that ``enrollment`` has completed."""
+    if uses_bitmap():
+        bitmap = LessonBitmap(enrollment.completed_bitmap)
+        slots = Lesson.objects.filter(
+            pk__in=lesson_ids, course_id=enrollment.course_id
+        ).values_list('id', 'slot')
+        return {pk for pk, slot in slots if bitmap.test(slot)}
+    return set(
+        CourseProgress.objects.filter(
+            enrollment=enrollment, lesson_id__in=lesson_ids, is_completed=True
+        ).values_list('lesson_id', flat=True)
+    )
+
+
+def lesson_progress_map(enrollment):
+    """
+    Completion state of every lesson of the enrollment's course, in course
+    order, from one query joining each lesson to this enrollment's progress.
+    """
+    lessons = Lesson.objects.filter(course_id=enrollment.course_id).order_by('order', 'id')
+    if keeps_progress_rows():
+        lessons = lessons.annotate(
+            own_progress=FilteredRelation(
+                'courseprogress', condition=Q(courseprogress__enrollment=enrollment)
+            ),
+        ).values(
+            'id', 'slot',
+            is_completed=F('own_progress__is_completed'),
+            completed_at=F('own_progress__completed_at'),
+        )
+    else:
+        lessons = lessons.values('id', 'slot')
+
+    bitmap = LessonBitmap(enrollment.completed_bitmap) if uses_bitmap() else None
+    pending = pending_completions(enrollment)
+    progress = []
+    for row in lessons:
+        is_completed = bitmap.test(row['slot']) if bitmap else bool(row['is_completed'])
+        completed_at = row.get('completed_at') if is_completed else None
+        if not is_completed and row['id'] in pending:
+            is_completed, completed_at = True, pending[row['id']]
+        progress.append({'lesson_id': row['id'], 'is_completed': is_completed, 'completed_at': completed_at})
+    return progress
+
+
+def is_lesson_completed(enrollment, lesson):
+    if uses_bitmap():
+        return LessonBitmap(enrollment.completed_bitmap).test(lesson.slot)
+    return CourseProgress.objects.filter(
+        enrollment=enrollment, lesson=lesson, is_completed=True
+    ).exists()
+
+
+def record_completions(student, items):
+    """
+    Apply a batch of ``{"lesson_id", "completed_at"}`` items for ``student``,
+    e.g. replayed by an offline client. Returns one result per item, in order.
+    """
+    now = timezone.now()
+    lesson_ids = {item['lesson_id'] for item in items}
+    lessons = {
+        pk: (course_id, slot) for pk, course_id, slot in
+        Lesson.objects.filter(pk__in=lesson_ids).order_by().values_list('id', 'course_id', 'slot')
+    }
+    lesson_courses = {pk: course_id for pk, (course_id, _slot) in lessons.items()}
+    enrollment_rows = Enrollment.objects.filter(
+        student=student, course_id__in=set(lesson_courses.values())
+    ).order_by().values_list('course_id', 'id', 'completed_bitmap')
+    enrollments = {}
+    if uses_bitmap():
+        bitmaps = {}
+        for course_id, enrollment_id, data in enrollment_rows:
+            enrollments[course_id] = enrollment_id
+            bitmaps[course_id] = LessonBitmap(data)
+        done = {
+            (enrollments[course_id], pk) for pk, (course_id, slot) in lessons.items()
+            if course_id in bitmaps and bitmaps[course_id].test(slot)
+        }
+    else:
+        enrollments = {course_id: enrollment_id for course_id, enrollment_id, _data in enrollment_rows}
+        done = set(
+            CourseProgress.objects.filter(
+                enrollment_id__in=enrollments.values(), lesson_id__in=lesson_ids, is_completed=True
+            ).values_list('enrollment_id', 'lesson_id')
+        )
+
+    results, rows = [], []
+    for item in items:
+        lesson_id = item['lesson_id']
+        if lesson_id not in lesson_courses:
+            results.append({'lesson_id': lesson_id, 'status': 'unknown_lesson'})
+            continue
+        enrollment_id = enrollments.get(lesson_courses[lesson_id])
+        if enrollment_id is None:
+            results.append({'lesson_id': lesson_id, 'status': 'not_enrolled'})
+            continue
+        if (enrollment_id, lesson_id) in done:
+            results.append({'lesson_id': lesson_id, 'status': 'already_completed'})
+            continue
+        done.add((enrollment_id, lesson_id))
+        completed_at = min(item.get('completed_at') or now, now)
+        rows.append(CourseProgress(
+            enrollment_id=enrollment_id, lesson_id=lesson_id,
+            is_completed=True, completed_at=completed_at,
+        ))
+        results.append({'lesson_id': lesson_id, 'status': 'completed', 'completed_at': completed_at})
+
+    if rows:
+        with transaction.atomic():
+            if keeps_progress_rows():
+                CourseProgress.objects.bulk_create(
+                    rows, update_conflicts=True,
+                    unique_fields=['enrollment', 'lesson'],
+                    update_fields=['is_completed', 'completed_at'],
+                )
+            enrollment_ids = {row.enrollment_id for row in rows}
+            if uses_bitmap():
+                new_slots = {}
+                for row in rows:
+                    new_slots.setdefault(row.enrollment_id, []).append(lessons[row.lesson_id][1])
+                for enrollment_id, slots in new_slots.items():
+                    set_completed_slots(enrollment_id, slots)
+                mark_completed_if_finished(enrollment_ids, now)
+                enrollments_updated(Enrollment.objects.filter(pk__in=enrollment_ids))
+            else:
+                recompute_progress(enrollment_ids)
+    return results
+
+
+def pending_completions(enrollment):
+    """Queued (write-behind) completions of ``enrollment`` not yet in the database."""
+    if not write_behind.is_enabled():
+        return {}
+    pending = write_behind.get_queue().pending_lessons(enrollment.student_id, enrollment.course_id)
+    if pending:
+        for lesson_id in completed_lesson_ids(enrollment, pending):
+            pending.pop(lesson_id, None)
+    return pending
+
+
+def queue_completion(enrollment, lesson_id):
+    """
+    Queue a completion for write-behind and return ``enrollment`` with its
+    progress as it will be once the queue is flushed (not saved).
+    """
+    write_behind.get_queue().push(
+        enrollment.student_id, enrollment.course_id, lesson_id, timezone.now()
+    )
+    write_behind.schedule_flush()
+
+    pending = pending_completions(enrollment)
+    if pending:
+        total = Course.objects.filter(pk=enrollment.course_id).values_list('lesson_count', flat=True).first()
+        enrollment.completed_lessons += len(pending)
+        enrollment.progress = expected_progress(enrollment.completed_lessons, total)
+    return enrollment
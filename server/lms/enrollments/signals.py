@@ -0,0 +1,60 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from courses import counters
+from courses.models import Lesson
+from courses.signals import lessons_bulk_changed
+from lms.tasks import enqueue_unique
+from . import archive, services
+from .models import Enrollment
+
+# Sent by writes that change enrollment statuses in bulk, bypassing
+# post_save (queryset updates, bulk_create). Argument: deltas, a dict of
+# status -> change in the number of enrollments with that status.
+enrollment_statuses_changed = Signal()
+
+# Sent by those same writes, and by ones that only move progress, with the
+# affected rows. Argument: enrollments, a lazy Enrollment queryset.
+enrollments_updated = Signal()
+
+
+@receiver(post_save, sender=Enrollment)
+def increment_course_enrollment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust_enrollment_count(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def decrement_course_enrollment_count(sender, instance, **kwargs):
+    if archive.is_archiving():
+        return
+    counters.adjust_enrollment_count(instance.course_id, -1)
+
+
+def schedule_progress_recalculation(course_id):
+    """Recalculate the course's enrollments in the background, once per burst of edits."""
+    enqueue_unique(('course-progress', course_id), services.recalculate_course_progress, course_id)
+
+
+@receiver(post_save, sender=Lesson)
+def recalculate_progress_on_new_lesson(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        schedule_progress_recalculation(instance.course_id)
+        return
+    old_course_id = instance.loaded_value('course_id')
+    if old_course_id is not None and old_course_id != instance.course_id:
+        schedule_progress_recalculation(old_course_id)
+        schedule_progress_recalculation(instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def recalculate_progress_on_deleted_lesson(sender, instance, **kwargs):
+    schedule_progress_recalculation(instance.course_id)
+
+
+@receiver(lessons_bulk_changed, sender=Lesson)
+def recalculate_progress_on_bulk_create(sender, course_id, lessons, created, **kwargs):
+    if created:
+        schedule_progress_recalculation(course_id)
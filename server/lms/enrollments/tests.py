@@ -1,3 +1,395 @@
-from django.test import TestCase
+import tempfile
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Course, Lesson
+from . import archive, services, write_behind
+from .bitmap import LessonBitmap
+from .models import ArchivedCourseProgress, ArchivedEnrollment, CourseProgress, Enrollment
+
+User = get_user_model()
+
+
+class LessonBitmapTests(TestCase):
+    def test_set_test_and_popcount(self):
+        bitmap = LessonBitmap()
+        self.assertTrue(bitmap.set(0))
+        self.assertTrue(bitmap.set(9))
+        self.assertFalse(bitmap.set(9))
+        self.assertTrue(bitmap.test(9))
+        self.assertFalse(bitmap.test(1))
+        self.assertEqual(bitmap.to_bytes(), b'\x01\x02')
+        self.assertEqual(LessonBitmap(bitmap.to_bytes()), bitmap)
+        self.assertEqual(bitmap.popcount(), 2)
+        self.assertEqual(bitmap.popcount(LessonBitmap.from_slots([9, 10])), 1)
+
+
+class CompleteLessonTests(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', username='student', password='secret-pass'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lessons = [Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(2)]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_completing_twice_counts_once(self):
+        services.complete_lesson(self.enrollment, self.lessons[0].id)
+        enrollment = services.complete_lesson(self.enrollment, self.lessons[0].id)
+        self.assertEqual(enrollment.completed_lessons, 1)
+        self.assertEqual(enrollment.progress, Decimal('50.00'))
+        self.assertEqual(CourseProgress.objects.filter(is_completed=True).count(), 1)
+        self.assertEqual(enrollment.status, 'active')
+
+    def test_progress_uses_stored_lesson_count(self):
+        Course.objects.filter(pk=self.course.pk).update(lesson_count=8)
+        enrollment = services.complete_lesson(self.enrollment, self.lessons[1].id)
+        self.assertEqual(enrollment.progress, Decimal('12.50'))
+
+
+class SyncCompletionsTests(TestCase):
+    setUp = CompleteLessonTests.setUp
+
+    def test_per_item_statuses_and_one_recount(self):
+        services.complete_lesson(self.enrollment, self.lessons[0].id)
+        other_course = Course.objects.create(
+            instructor=self.course.instructor, title='Other', slug='other',
+            description='...', price=10, is_published=True
+        )
+        other_lesson = Lesson.objects.create(course=other_course, title='Elsewhere', order=1)
+        future = timezone.now() + timedelta(days=3)
+
+        client = APIClient()
+        client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/enrollments/sync-completions/', [
+                {'lesson_id': self.lessons[0].id},
+                {'lesson_id': self.lessons[1].id, 'completed_at': future.isoformat()},
+                {'lesson_id': self.lessons[1].id},
+                {'lesson_id': other_lesson.id},
+                {'lesson_id': 999999},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r['status'] for r in response.data['results']],
+            ['already_completed', 'completed', 'already_completed', 'not_enrolled', 'unknown_lesson'],
+        )
+        self.assertLess(response.data['results'][1]['completed_at'], future)
+        recounts = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "enrollments_enrollment" SET "completed_lessons"')]
+        self.assertEqual(len(recounts), 1)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.completed_lessons, self.enrollment.status), (2, 'completed'))
+
+
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        CompleteLessonTests.setUp(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(
+            PROGRESS_WRITE_BEHIND=True, PROGRESS_FLUSH_INTERVAL=None,
+            PROGRESS_QUEUE_PATH=Path(directory.name) / 'queue.sqlite3',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.queue = write_behind.get_queue()
+
+    def test_queued_completion_is_merged_until_flushed(self):
+        enrollment = services.complete_lesson(self.enrollment, self.lessons[0].id)
+        self.assertEqual(enrollment.progress, Decimal('50.00'))
+        self.assertFalse(CourseProgress.objects.exists())
+        self.assertEqual(list(self.queue.pending_lessons(self.student.id, self.course.id)), [self.lessons[0].id])
+        progress = services.lesson_progress_map(Enrollment.objects.get(pk=self.enrollment.pk))
+        self.assertEqual([l['is_completed'] for l in progress], [True, False])
+
+        out = StringIO()
+        call_command('flush_completions', stdout=out)
+        self.assertIn('Applied 1 queued completions', out.getvalue())
+        self.assertEqual(len(self.queue), 0)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+        self.assertEqual(services.pending_completions(self.enrollment), {})
+
+    def test_queued_progress_rounds_like_the_database(self):
+        # 1/160 is 0.625%: progress_percentage() rounds half up, to 0.63.
+        Course.objects.filter(pk=self.course.pk).update(lesson_count=160)
+        enrollment = services.complete_lesson(self.enrollment, self.lessons[0].id)
+        self.assertEqual(enrollment.progress, Decimal('0.63'))
+        self.assertEqual(enrollment.progress, services.expected_progress(1, 160))
+
+    def test_claim_ack_and_release(self):
+        now = timezone.now()
+        for lesson in self.lessons:
+            self.queue.push(self.student.id, self.course.id, lesson.id, now)
+        claimed = self.queue.claim(1)
+        self.assertEqual([row[2] for row in claimed], [self.lessons[0].id])
+        self.assertEqual([row[2] for row in self.queue.claim(5)], [self.lessons[1].id])
+        self.assertEqual(self.queue.claim(5), [])
+
+        self.queue.release([claimed[0][0]])
+        self.assertEqual(self.queue.claim(5), claimed)
+        self.queue.ack([claimed[0][0]])
+        self.assertEqual(len(self.queue), 1)
+
+
+@override_settings(PROGRESS_STORAGE='bitmap')
+class BitmapProgressTests(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', username='student', password='secret-pass'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(4)
+        ]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_lessons_get_distinct_slots(self):
+        self.assertEqual([lesson.slot for lesson in self.lessons], [0, 1, 2, 3])
+
+    def test_complete_lesson_sets_bit_without_rows(self):
+        enrollment = services.complete_lesson(self.enrollment, self.lessons[2].id)
+        services.complete_lesson(enrollment, self.lessons[2].id)
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.completed_lessons, 1)
+        self.assertEqual(enrollment.progress, Decimal('25.00'))
+        self.assertTrue(services.is_lesson_completed(enrollment, self.lessons[2]))
+        self.assertFalse(services.is_lesson_completed(enrollment, self.lessons[0]))
+        self.assertFalse(CourseProgress.objects.exists())
+
+    def test_deleted_lessons_are_not_counted(self):
+        results = services.record_completions(
+            self.student, [{'lesson_id': lesson.id} for lesson in self.lessons[:2]]
+        )
+        self.assertEqual([r['status'] for r in results], ['completed', 'completed'])
+        self.lessons[0].delete()
+        services.recompute_progress([self.enrollment.pk])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+
+    def test_build_bitmaps_from_rows(self):
+        with self.settings(PROGRESS_STORAGE='rows'):
+            services.complete_lesson(self.enrollment, self.lessons[3].id)
+        self.assertEqual(services.build_completion_bitmaps(), 1)
+        self.enrollment.refresh_from_db()
+        self.assertTrue(services.is_lesson_completed(self.enrollment, self.lessons[3]))
+
+
+class EnrollmentListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.client.force_authenticate(self.instructor)
+
+    def enroll_students(self, count):
+        start = Enrollment.objects.count()
+        for i in range(start, start + count):
+            course = Course.objects.create(
+                instructor=self.instructor, title=f'Course {i}', slug=f'course-{i}',
+                description='...', price=10, is_published=True
+            )
+            student = User.objects.create_user(
+                email=f'student{i}@example.com', username=f'student{i}', password='secret-pass'
+            )
+            Enrollment.objects.create(student=student, course=course)
+
+    def assertQueryCountIsFlat(self, url):
+        for batch in (1, 10):
+            self.enroll_students(batch)
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count(self):
+        response = self.assertQueryCountIsFlat('/api/enrollments/')
+        self.assertEqual(response.data['results'][0]['course_details']['instructor']['id'], self.instructor.id)
+
+    def test_compact_list_query_count(self):
+        response = self.assertQueryCountIsFlat('/api/enrollments/?compact=1')
+        self.assertEqual(
+            set(response.data['results'][0]['course_details']), {'id', 'title', 'slug', 'thumbnail'}
+        )
+
+
+class EnrollmentCreationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        self.course = Course.objects.create(
+            instructor=self.instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        self.students = [
+            User.objects.create_user(email=f's{i}@example.com', username=f's{i}', password='secret-pass')
+            for i in range(3)
+        ]
+
+    def test_duplicate_enrollment_is_a_validation_error(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.post('/api/enrollments/', {'course': self.course.id})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/enrollments/', {'course': self.course.id})
+        self.assertEqual(response.status_code, 400)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 1)
+
+    def test_bulk_enroll_reports_created_and_existing(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        self.client.force_authenticate(self.instructor)
+        response = self.client.post('/api/enrollments/bulk-enroll/', {
+            'course': self.course.id,
+            'students': [str(self.students[0].id), 's1@example.com', str(self.students[2].id), 'nobody@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 2, 'already_enrolled': 1, 'unknown': ['nobody@example.com']})
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 3)
+
+    def test_bulk_enroll_only_enrolls_students(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret-pass', role='admin'
+        )
+        self.client.force_authenticate(self.instructor)
+        response = self.client.post('/api/enrollments/bulk-enroll/', {
+            'course': self.course.id,
+            'students': [str(admin.id), 'instructor@example.com', 's0@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {
+            'created': 1, 'already_enrolled': 0, 'unknown': [str(admin.id), 'instructor@example.com'],
+        })
+
+    def test_bulk_enroll_requires_course_instructor(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.post('/api/enrollments/bulk-enroll/', {
+            'course': self.course.id, 'students': ['s1@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class RecomputeProgressCommandTests(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(
+            email='instructor@example.com', username='instructor',
+            password='secret-pass', role='instructor'
+        )
+        student = User.objects.create_user(
+            email='student@example.com', username='student', password='secret-pass'
+        )
+        self.course = Course.objects.create(
+            instructor=instructor, title='Course', slug='course',
+            description='...', price=10, is_published=True
+        )
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        self.enrollment = Enrollment.objects.create(student=student, course=self.course)
+        services.complete_lesson(self.enrollment, lesson.id)
+        Lesson.objects.create(course=self.course, title='Added later', order=2)
+
+    def test_dry_run_then_recompute(self):
+        out = StringIO()
+        call_command('recompute_progress', '--dry-run', stdout=out)
+        self.assertIn('100.00%, completed -> 1 lessons, 50.00%, active', out.getvalue())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.status, 'completed')
+
+        call_command('recompute_progress', '--course', str(self.course.id), stdout=StringIO())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.status, 'active')
+        self.assertEqual(self.enrollment.progress, Decimal('50.00'))
+        self.assertIsNone(self.enrollment.completed_at)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class LessonChangeRecalculationTests(TestCase):
+    setUp = RecomputeProgressCommandTests.setUp
+
+    def test_adding_and_deleting_lessons_recalculates_progress(self):
+        self.enrollment.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(course=self.course, title='Another', order=3)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, Decimal('33.33'))
+        self.assertEqual(self.enrollment.status, 'active')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.filter(course=self.course).exclude(title='Intro').delete()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, Decimal('100.00'))
+        self.assertEqual(self.enrollment.status, 'completed')
+
+    def test_course_without_lessons_matches_the_recompute_command(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.filter(course=self.course).delete()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(
+            (self.enrollment.completed_lessons, self.enrollment.progress, self.enrollment.status),
+            (0, Decimal('0.00'), 'active'),
+        )
+        self.assertIsNone(self.enrollment.completed_at)
+        self.assertEqual(services.recompute_progress([self.enrollment.pk], dry_run=True), [])
+
+
+class EnrollmentArchiveTests(TestCase):
+    setUp = RecomputeProgressCommandTests.setUp
+
+    def age(self, days):
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(
+            completed_at=timezone.now() - timedelta(days=days)
+        )
+
+    def test_archive_history_and_restore(self):
+        enrolled_at = Enrollment.objects.get(pk=self.enrollment.pk).enrolled_at
+        self.age(10)
+        self.assertEqual(archive.archive_enrollments(older_than_days=30), 0)
+        self.age(40)
+        self.assertEqual(archive.archive_enrollments(older_than_days=30), 1)
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(ArchivedCourseProgress.objects.count(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 1)
+        call_command('recount_catalog', stdout=StringIO())
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 1)
+
+        client = APIClient()
+        client.force_authenticate(self.enrollment.student)
+        response = client.get('/api/enrollments/history/')
+        self.assertEqual([(e['id'], e['archived']) for e in response.data], [(self.enrollment.pk, True)])
+
+        self.assertEqual(archive.restore_enrollments([self.enrollment.pk]), (1, 0))
+        restored = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual(restored.enrolled_at, enrolled_at)
+        self.assertEqual(restored.lesson_progress.count(), 1)
+        self.assertFalse(ArchivedEnrollment.objects.exists())
@@ -1,52 +1,118 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.utils import timezone
-from .models import Enrollment, CourseProgress
-from .serializers import EnrollmentSerializer, CourseProgressSerializer
-from courses.models import Course
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from .models import ArchivedEnrollment, Enrollment
+from .serializers import (
+    ArchivedEnrollmentHistorySerializer, BulkEnrollSerializer, EnrollmentHistorySerializer, CompactEnrollmentSerializer, CompletionSyncSerializer, EnrollmentSerializer,
+)
+from . import services
+from courses.models import Course, Lesson
+from courses.serializers import COURSE_SUMMARY_FIELDS
+from lms.pagination import EnrollmentPagination
 
 class EnrollmentViewSet(viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EnrollmentPagination
+    max_sync_batch = 1000
+    # Columns read by EnrollmentSerializer besides the course.
+    enrollment_fields = [
+        'id', 'student', 'course', 'status', 'enrolled_at', 'completed_at', 'progress',
+        'student__first_name', 'student__last_name', 'student__username', 'student__email',
+    ]
+
+    def is_compact(self):
+        return self.request.query_params.get('compact', '').lower() in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve') and self.is_compact():
+            return CompactEnrollmentSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
-            return Enrollment.objects.all()
+            queryset = Enrollment.objects.all()
         elif user.role == 'instructor':
-            return Enrollment.objects.filter(course__instructor=user)
-        return Enrollment.objects.filter(student=user)
+            queryset = Enrollment.objects.filter(course__instructor=user)
+        else:
+            queryset = Enrollment.objects.filter(student=user)
+
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        # Everything the serializer reads comes from the same single query.
+        if self.is_compact():
+            course_fields = [f'course__{name}' for name in COURSE_SUMMARY_FIELDS]
+            return queryset.select_related('student', 'course').only(*self.enrollment_fields, *course_fields)
+        return queryset.select_related('student', 'course__instructor', 'course__category')
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        try:
+            services.enroll(serializer, self.request.user)
+        except services.AlreadyEnrolled:
+            raise ValidationError({"non_field_errors": ["You are already enrolled in this course."]})
+
+    @action(detail=False, methods=['GET'])
+    def history(self, request):
+        """All of the user's enrollments, newest first, including archived ones."""
+        course_fields = [f'course__{name}' for name in COURSE_SUMMARY_FIELDS]
+        live = Enrollment.objects.filter(student=request.user).select_related('course').only(
+            'id', 'course', 'status', 'enrolled_at', 'completed_at', 'progress', *course_fields
+        )
+        archived = ArchivedEnrollment.objects.filter(student=request.user).select_related('course').only(
+            'id', 'course', 'status', 'enrolled_at', 'completed_at', 'progress', *course_fields
+        )
+        enrollments = sorted([*live, *archived], key=lambda e: e.enrolled_at, reverse=True)
+        return Response([
+            (ArchivedEnrollmentHistorySerializer if isinstance(e, ArchivedEnrollment)
+             else EnrollmentHistorySerializer)(e).data
+            for e in enrollments
+        ])
+
+    @action(detail=False, methods=['POST'], url_path='bulk-enroll')
+    def bulk_enroll(self, request):
+        """Enroll ``{"course": id, "students": [id or email, ...]}``; existing enrollments are kept."""
+        serializer = BulkEnrollSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        course = Course.objects.filter(pk=serializer.validated_data['course']).only('id', 'instructor_id').first()
+        if course is None:
+            raise ValidationError({"course": ["Course not found."]})
+        if request.user.role != 'admin' and course.instructor_id != request.user.id:
+            raise PermissionDenied("You are not the instructor of this course.")
+
+        identifiers = list(dict.fromkeys(value.strip() for value in serializer.validated_data['students']))
+        student_ids, unknown = services.resolve_students(identifiers)
+        created, already_enrolled = services.bulk_enroll(course.id, student_ids)
+        return Response({
+            "created": created,
+            "already_enrolled": already_enrolled,
+            "unknown": unknown,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     @action(detail=True, methods=['POST'])
     def complete_lesson(self, request, pk=None):
         enrollment = self.get_object()
         lesson_id = request.data.get('lesson_id')
         
-        if not lesson_id:
+        if not str(lesson_id).isdigit():
             return Response({"error": "lesson_id is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        progress, created = CourseProgress.objects.get_or_create(
-            enrollment=enrollment,
-            lesson_id=lesson_id
-        )
-        
-        if not progress.is_completed:
-            progress.is_completed = True
-            progress.completed_at = timezone.now()
-            progress.save()
-            
-            total_lessons = enrollment.course.lessons.count()
-            completed_lessons = enrollment.lesson_progress.filter(is_completed=True).count()
-            if total_lessons > 0:
-                enrollment.progress = (completed_lessons / total_lessons) * 100
-                if enrollment.progress == 100:
-                    enrollment.status = 'completed'
-                    enrollment.completed_at = timezone.now()
-                enrollment.save()
+        if not Lesson.objects.filter(pk=lesson_id, course_id=enrollment.course_id).exists():
+            return Response({"error": "Lesson not found in this course"}, status=status.HTTP_400_BAD_REQUEST)
 
+        enrollment = services.complete_lesson(enrollment, int(lesson_id))
         return Response({"message": "Lesson marked as completed", "progress": enrollment.progress})
+
+
+    @action(detail=False, methods=['POST'], url_path='sync-completions')
+    def sync_completions(self, request):
+        """Apply a list of ``{lesson_id, completed_at}`` completions in one go."""
+        serializer = CompletionSyncSerializer(data=request.data, many=True, allow_empty=False,
+                                              max_length=self.max_sync_batch)
+        serializer.is_valid(raise_exception=True)
+
+        results = services.record_completions(request.user, serializer.validated_data)
+        return Response({"results": results})
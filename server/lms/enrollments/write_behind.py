@@ -0,0 +1,190 @@
+"""
+Optional write-behind buffer for lesson completions.
+
+With ``PROGRESS_WRITE_BEHIND = True`` a completion is appended to a small
+SQLite journal (``PROGRESS_QUEUE_PATH``), separate from the main database,
+and acknowledged at once. ``flush()`` later applies queued completions in
+batches through ``services.record_completions`` inside one transaction, so a
+cohort finishing the same lesson takes the main database's write lock once
+per batch rather than once per request. Until then, reads merge the queued
+items so students always see their own completions.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Claimed rows not acknowledged within this many seconds (e.g. the flushing
+# process died) become claimable again.
+CLAIM_TIMEOUT = 300
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS pending_completion ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " student_id INTEGER NOT NULL,"
+    " course_id INTEGER NOT NULL,"
+    " lesson_id INTEGER NOT NULL,"
+    " completed_at TEXT NOT NULL,"
+    " claimed_at REAL NULL)",
+    "CREATE INDEX IF NOT EXISTS pending_completion_student"
+    " ON pending_completion (student_id, course_id)",
+]
+
+
+def is_enabled():
+    return getattr(settings, 'PROGRESS_WRITE_BEHIND', False)
+
+
+class CompletionQueue:
+    def __init__(self, path):
+        self.path = str(path)
+        self._initialized = False
+
+    @contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            if not self._initialized:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                self._initialized = True
+            yield connection
+        finally:
+            connection.close()
+
+    def push(self, student_id, course_id, lesson_id, completed_at):
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO pending_completion (student_id, course_id, lesson_id, completed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (student_id, course_id, lesson_id, completed_at.isoformat()),
+            )
+
+    def pending_lessons(self, student_id, course_id):
+        """Return ``{lesson_id: completed_at}`` of queued completions."""
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT lesson_id, MIN(completed_at) FROM pending_completion"
+                " WHERE student_id = ? AND course_id = ? GROUP BY lesson_id",
+                (student_id, course_id),
+            ).fetchall()
+        return {lesson_id: datetime.fromisoformat(completed_at) for lesson_id, completed_at in rows}
+
+    def claim(self, limit):
+        """Reserve up to ``limit`` unclaimed rows for flushing."""
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = connection.execute(
+                    "SELECT id, student_id, lesson_id, completed_at FROM pending_completion"
+                    " WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?",
+                    (now - CLAIM_TIMEOUT, limit),
+                ).fetchall()
+                connection.executemany(
+                    "UPDATE pending_completion SET claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows],
+                )
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        return rows
+
+    def ack(self, ids):
+        with self.connect() as connection:
+            connection.executemany("DELETE FROM pending_completion WHERE id = ?", [(pk,) for pk in ids])
+
+    def release(self, ids):
+        with self.connect() as connection:
+            connection.executemany(
+                "UPDATE pending_completion SET claimed_at = NULL WHERE id = ?", [(pk,) for pk in ids]
+            )
+
+    def __len__(self):
+        with self.connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM pending_completion").fetchone()[0]
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    path = settings.PROGRESS_QUEUE_PATH
+    if _queue is None or _queue.path != str(path):
+        _queue = CompletionQueue(path)
+    return _queue
+
+
+def flush(batch_size=None):
+    """Apply one batch of queued completions. Returns the number applied."""
+    from .services import record_completions
+
+    queue = get_queue()
+    rows = queue.claim(batch_size or getattr(settings, 'PROGRESS_FLUSH_BATCH', 500))
+    if not rows:
+        return 0
+
+    by_student = defaultdict(list)
+    for _pk, student_id, lesson_id, completed_at in rows:
+        by_student[student_id].append({
+            'lesson_id': lesson_id, 'completed_at': datetime.fromisoformat(completed_at),
+        })
+    try:
+        with transaction.atomic():
+            for student_id, items in by_student.items():
+                record_completions(student_id, items)
+    except Exception:
+        queue.release([row[0] for row in rows])
+        raise
+    queue.ack([row[0] for row in rows])
+    return len(rows)
+
+
+def flush_all(batch_size=None):
+    total = 0
+    while True:
+        applied = flush(batch_size)
+        if not applied:
+            return total
+        total += applied
+
+
+_flush_timer = None
+_flush_lock = threading.Lock()
+
+
+def _timed_flush():
+    global _flush_timer
+    with _flush_lock:
+        _flush_timer = None
+    try:
+        flush_all()
+    except Exception:
+        logger.exception('Flushing queued lesson completions failed')
+    finally:
+        connections.close_all()
+
+
+def schedule_flush():
+    """Flush in the background after ``PROGRESS_FLUSH_INTERVAL`` seconds, once per window."""
+    global _flush_timer
+    interval = getattr(settings, 'PROGRESS_FLUSH_INTERVAL', 2)
+    if interval is None:
+        return
+    with _flush_lock:
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(interval, _timed_flush)
+            _flush_timer.daemon = True
+            _flush_timer.start()
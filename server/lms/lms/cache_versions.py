@@ -0,0 +1,36 @@
+"""
+Counters and version numbers kept in the default cache.
+
+Versioned caches embed ``get_version(key)`` in their entry keys; bumping
+the version makes every older entry unreachable, so nothing has to be
+purged and stale entries simply age out.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def incr(key, delta=1):
+    """Add ``delta`` to a counter that never expires, creating it if needed."""
+    if cache.add(key, delta, timeout=None):
+        return delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never restarts at a
+        # value that older cache entries were written under.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    get_version(key)
+    return incr(key)
@@ -0,0 +1,93 @@
+"""
+Resized WebP derivatives of uploaded images.
+
+Every original gets one variant per width in ``IMAGE_VARIANT_WIDTHS``, stored
+next to it under ``derivatives/``. Uploaded names are unique, so a variant
+never changes once written and can be served with immutable cache headers.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from . import tasks
+
+DERIVATIVES_DIR = 'derivatives'
+
+
+def variant_widths():
+    return getattr(settings, 'IMAGE_VARIANT_WIDTHS', (64, 256, 768))
+
+
+def variant_name(name, width):
+    return f'{DERIVATIVES_DIR}/{name}.{width}.webp'
+
+
+def original_name(variant):
+    """Inverse of ``variant_name()``; ``variant`` is relative to ``DERIVATIVES_DIR``."""
+    name, _width, _ext = variant.rsplit('.', 2)
+    return name
+
+
+def generate_variants(name, storage=default_storage, force=False):
+    """Write every missing variant of ``name``. Returns the number written."""
+    targets = [
+        (width, variant_name(name, width)) for width in variant_widths()
+    ]
+    if not force:
+        targets = [(width, target) for width, target in targets if not storage.exists(target)]
+    if not targets:
+        return 0
+
+    with storage.open(name, 'rb') as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    for width, target in targets:
+        variant = image.copy()
+        variant.thumbnail((width, width), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, format='WEBP', quality=80, method=6)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+    return len(targets)
+
+
+def _generate_variants_task(name):
+    generate_variants(name)
+
+
+def queue_variants(instance, field_name, created=False, update_fields=None):
+    """
+    Schedule variant generation when ``field_name`` holds a new upload.
+    Intended for post_save receivers of models using TrackedModelMixin.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    name = getattr(instance, field_name).name
+    if name and (created or instance.loaded_value(field_name) != name):
+        tasks.enqueue(_generate_variants_task, name)
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only ``{width: url}`` map of an image field's derivatives."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for width in variant_widths():
+            url = value.storage.url(variant_name(value.name, width))
+            urls[str(width)] = request.build_absolute_uri(url) if request else url
+        return urls
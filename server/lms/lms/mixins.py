@@ -0,0 +1,29 @@
+from django.db import transaction
+
+
+class TrackedModelMixin:
+    """
+    Model mixin for rows whose saves drive denormalized data elsewhere.
+
+    ``save()`` runs inside a transaction together with its ``post_save``
+    receivers, and ``loaded_value()`` returns a field as it was last read
+    from or written to the database, so receivers can tell what changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def loaded_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
@@ -0,0 +1,104 @@
+import json
+from functools import reduce
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination: each page seeks on the full ``(field, ..., id)``
+    ordering instead of scanning an OFFSET, and no total COUNT is issued.
+    The cursor carries the ordering values of the row it points at, so the
+    composite indexes on those columns serve every page, ties included.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # Full-text queries annotate each row with its relevance position.
+        if 'search_rank' in queryset.query.annotations:
+            return ('search_rank', 'id')
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        # Always end on the primary key so that every row has a unique position.
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = [self.flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(ordering, self.decode_position(self.cursor.position)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Rows strictly after ``values`` in ``ordering``: a row-value comparison spelled out with Q."""
+        conditions = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {ordering[j].lstrip('-'): values[j] for j in range(i)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        return reduce(lambda a, b: a | b, conditions)
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def position_of(self, instance):
+        values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        return json.dumps(values, default=str)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.position_of(self.page[-1])))
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.position_of(self.page[0])))
+
+
+class CoursePagination(CatalogCursorPagination):
+    ordering = ('title', 'id')
+
+
+class LessonPagination(CatalogCursorPagination):
+    ordering = ('order', 'id')
+
+
+class EnrollmentPagination(CatalogCursorPagination):
+    ordering = ('-enrolled_at', '-id')
@@ -93,6 +93,47 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'lms'),
+    }
+}
+
+# Seconds an anonymous catalog response may be served from the cache.
+CATALOG_CACHE_TIMEOUT = 300
+
+# max-age sent to shared caches for published course pages viewed anonymously.
+CATALOG_HTTP_MAX_AGE = 60
+
+# Seconds a lesson body stays cached; keys include updated_at, so edits show at once.
+LESSON_CONTENT_CACHE_TIMEOUT = 3600
+
+# Seconds a dashboard payload is reused, and how long concurrent requests
+# wait for the one recomputing it before computing it themselves.
+DASHBOARD_CACHE_TIMEOUT = 30
+DASHBOARD_CACHE_WAIT = 5
+
+
+# Write-behind for lesson completions: acknowledge from a local journal and
+# apply to the database in batches (see enrollments/write_behind.py).
+PROGRESS_WRITE_BEHIND = os.getenv('PROGRESS_WRITE_BEHIND', '') == '1'
+PROGRESS_QUEUE_PATH = BASE_DIR / 'progress_queue.sqlite3'
+PROGRESS_FLUSH_INTERVAL = 2
+PROGRESS_FLUSH_BATCH = 500
+
+# Where lesson completions live: 'rows' (one CourseProgress row per lesson) or
+# 'bitmap' (Enrollment.completed_bitmap, see enrollments/bitmap.py). After
+# switching to 'bitmap', run `manage.py build_progress_bitmaps` once. With
+# PROGRESS_HISTORY_ROWS, bitmap mode still records CourseProgress rows so
+# completion dates stay available.
+PROGRESS_STORAGE = os.getenv('PROGRESS_STORAGE', 'rows')
+PROGRESS_HISTORY_ROWS = os.getenv('PROGRESS_HISTORY_ROWS', '') == '1'
+
+# Completed/cancelled enrollments finished this many days ago are moved to the
+# archive tables by `manage.py archive_enrollments` (run it from cron).
+ENROLLMENT_ARCHIVE_AFTER_DAYS = 365
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -181,3 +222,9 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Widths (px) of the WebP variants generated for thumbnails, icons and avatars.
+IMAGE_VARIANT_WIDTHS = (64, 256, 768)
+
+# Threads used by lms.tasks for work done after the response, e.g. resizing.
+BACKGROUND_TASK_WORKERS = 2
@@ -0,0 +1,92 @@
+"""
+In-process background tasks.
+
+``enqueue()`` hands a callable to a small thread pool once the current
+transaction commits, so request handlers return without waiting for slow
+work such as image processing. Set ``BACKGROUND_TASKS_EAGER = True`` to run
+tasks inline instead (useful in tests and management commands).
+
+``enqueue_unique()`` coalesces tasks by key: while a task with the same key
+is waiting, further requests are dropped, and while it runs they collapse
+into a single rerun once it finishes.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+QUEUED, RUNNING, RERUN = 'queued', 'running', 'rerun'
+_keyed_states = {}
+_keyed_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='lms-task',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        if not getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            # Worker threads open their own connections; don't leak them.
+            connections.close_all()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` in the background after the transaction commits."""
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            _run(func, args, kwargs)
+        else:
+            _get_executor().submit(_run, func, args, kwargs)
+
+    transaction.on_commit(submit)
+
+
+def _run_keyed(key, func, args, kwargs):
+    while True:
+        with _keyed_lock:
+            _keyed_states[key] = RUNNING
+        _run(func, args, kwargs)
+        with _keyed_lock:
+            if _keyed_states[key] != RERUN:
+                del _keyed_states[key]
+                return
+
+
+def enqueue_unique(key, func, *args, **kwargs):
+    """
+    Like ``enqueue()``, but at most one run of ``key`` is waiting at a time,
+    and requests made while it runs trigger exactly one more run afterwards.
+    """
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            _run(func, args, kwargs)
+            return
+        with _keyed_lock:
+            state = _keyed_states.get(key)
+            if state == RUNNING:
+                _keyed_states[key] = RERUN
+            if state is not None:
+                return
+            _keyed_states[key] = QUEUED
+        _get_executor().submit(_run_keyed, key, func, args, kwargs)
+
+    transaction.on_commit(submit)
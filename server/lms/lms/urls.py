@@ -1,14 +1,22 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .images import DERIVATIVES_DIR
+from .views import serve_image_variant
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/courses/', include('courses.urls')),
     path('api/enrollments/', include('enrollments.urls')),
     path('api/users/', include('users.urls')),
     path('api/dashboard/', include('dashboard.urls')),
+    re_path(
+        rf'^{settings.MEDIA_URL.lstrip("/")}{DERIVATIVES_DIR}/(?P<path>.+)$',
+        serve_image_variant,
+        name='image-variant',
+    ),
 ]
 
 if settings.DEBUG:
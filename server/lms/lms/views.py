@@ -0,0 +1,27 @@
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.utils.cache import patch_cache_control
+
+from .images import DERIVATIVES_DIR, original_name
+
+
+def serve_image_variant(request, path):
+    """
+    Serve a derivative with a one-year immutable lifetime. Until the worker
+    has written it, redirect to the original without letting anyone cache it.
+    """
+    name = f'{DERIVATIVES_DIR}/{path}'
+    if default_storage.exists(name):
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='image/webp')
+        patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+        return response
+
+    try:
+        original = original_name(path)
+    except ValueError:
+        raise Http404
+    if not default_storage.exists(original):
+        raise Http404
+    response = HttpResponseRedirect(default_storage.url(original))
+    patch_cache_control(response, no_store=True)
+    return response
@@ -4,7 +4,9 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
 
-class User(AbstractUser):
+from lms.mixins import TrackedModelMixin
+
+class User(TrackedModelMixin, AbstractUser):
     ADMIN = 'admin'
     INSTRUCTOR = 'instructor'
     STUDENT = 'student'
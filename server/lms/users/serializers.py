@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
+from lms.images import ImageVariantsField
 from .models import UserProfile, PasswordResetOTP
 
 User = get_user_model()
@@ -59,12 +60,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 
-            'role', 'phone_number', 'profile_picture', 'bio',
+            'role', 'phone_number', 'profile_picture', 'profile_picture_variants', 'bio',
             'date_of_birth', 'address', 'city', 'country', 'postal_code',
             'profile', 'is_email_verified'
         ]
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from lms.images import queue_variants
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def queue_profile_picture_variants(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        queue_variants(instance, 'profile_picture', created, update_fields)